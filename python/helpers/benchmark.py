@@ -0,0 +1,278 @@
+"""Cold versus warm startup benchmark for the helper functions.
+
+Cold runs start a new helper process per call, the way the Ruby code calls
+run.py today. Warm runs send the same calls to a single `run.py --serve`
+process. For example, to compare the pyenv shim with the launcher:
+
+    python benchmark.py --command "pyenv exec python3 run.py"
+    python benchmark.py --command "./run"
+
+`--memory` instead measures the peak memory of streaming the records of
+pip-compile files of 1,000 to 100,000 requirements, and fails if it grows
+with the size of the file:
+
+    python benchmark.py --memory
+"""
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HELPERS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def compiled_lines(count):
+    """The lines of a file like pip-compile --generate-hashes writes."""
+    yield "#\n# This file is autogenerated by pip-compile\n#\n"
+    for i in range(count):
+        yield (
+            f"package-{i}[extra]==1.{i}.0 ; python_version >= \"3.8\" \\\n"
+            f"    --hash=sha256:{i:064x} \\\n"
+            f"    --hash=sha256:{i + count:064x}\n"
+            f"    # via package-{i + 1}\n"
+        )
+
+
+def compiled_requirements(count):
+    return "".join(compiled_lines(count))
+
+
+FILES = {
+    "requirements/requirements.txt": (
+        "requests>=2.13.0,<3.0\n"
+        "urllib3==1.26.0\n"
+        "Flask[async]>=2.0\n"
+        "-c constraints.txt\n"
+    ),
+    "requirements/constraints.txt": "requests<3.0\n",
+    "compiled/requirements.txt": compiled_requirements(1000),
+    "setup/setup.py": (
+        "from setuptools import setup\n"
+        "setup(name='bench', install_requires=['requests>=2.13.0'])\n"
+    ),
+    "pep621/pyproject.toml": (
+        "[project]\n"
+        "name = 'bench'\n"
+        "dependencies = ['requests>=2.13.0', 'urllib3==1.26.0']\n"
+    ),
+    "uv/pyproject.toml": (
+        "[project]\n"
+        "name = 'bench'\n"
+        "dependencies = ['requests>=2.13.0', 'mylib']\n"
+        "[tool.uv.sources]\n"
+        "mylib = { path = '../mylib' }\n"
+    ),
+    "pipfile/Pipfile": "[packages]\nrequests = '*'\n",
+    "poetry/pyproject.toml": (
+        "[tool.poetry]\n"
+        "name = 'bench'\n"
+        "version = '0.1.0'\n"
+        "description = ''\n"
+        "authors = []\n"
+        "[tool.poetry.dependencies]\n"
+        "python = '^3.9'\n"
+        "requests = '^2.13'\n"
+    ),
+}
+
+
+def calls(workspace, network):
+    """The calls to time, as (label, function, args, options)."""
+    def call(function, *args, **options):
+        return function, function, list(args), options
+
+    yield call("parse_requirements", os.path.join(workspace, "requirements"))
+    yield (
+        "parse_requirements (1000 compiled)",
+        "parse_requirements",
+        [os.path.join(workspace, "compiled")],
+        {},
+    )
+    yield call("parse_setup", os.path.join(workspace, "setup"))
+    yield call(
+        "parse_pep621_pep735_dependencies",
+        os.path.join(workspace, "pep621", "pyproject.toml"),
+    )
+    yield (
+        "parse_pep621_pep735_dependencies (uv)",
+        "parse_pep621_pep735_dependencies",
+        [os.path.join(workspace, "uv", "pyproject.toml")],
+        {"ecosystem": "uv"},
+    )
+    yield call("get_pipfile_hash", os.path.join(workspace, "pipfile"))
+    yield call("get_pyproject_hash", os.path.join(workspace, "poetry"))
+    if network:
+        yield call("get_dependency_hash", "requests", "2.32.3", "sha256")
+
+
+def write_workspace(workspace):
+    for path, content in FILES.items():
+        path = os.path.join(workspace, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+
+def time_cold(command, function, args, options, repeat):
+    request = json.dumps(
+        {"function": function, "args": args, "options": options}
+    )
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            command, input=request, capture_output=True, text=True,
+            cwd=HELPERS_DIR, check=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_warm(server, function, args, options, repeat):
+    request = json.dumps(
+        {"id": 0, "function": function, "args": args, "options": options}
+    )
+    timings = []
+    # The first call pays for the function's imports
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        server.stdin.write(request + "\n")
+        server.stdin.flush()
+        server.stdout.readline()
+        timings.append(time.perf_counter() - start)
+    return timings[1:]
+
+
+# The sizes of the files `--memory` parses
+MEMORY_SIZES = [1000, 10000, 100000]
+
+
+def peak_rss(command, function, args, options):
+    """The peak resident memory, in MB, of a cold call, and its time."""
+    request = json.dumps(
+        {"function": function, "args": args, "options": options}
+    )
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL, text=True, cwd=HELPERS_DIR,
+    )
+    process.stdin.write(request)
+    process.stdin.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    # ru_maxrss is in kilobytes on Linux, and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return usage.ru_maxrss / scale, time.perf_counter() - start
+
+
+def measure_memory(command, max_growth_mb):
+    """Print the peak memory of streaming each size of file.
+
+    Returns whether it stayed within `max_growth_mb` of the smallest.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as workspace:
+        for size in MEMORY_SIZES:
+            directory = os.path.join(workspace, str(size))
+            os.makedirs(directory)
+            # Written a line at a time, as the peak memory of this process
+            # carries over to the helper it starts
+            with open(os.path.join(directory, "requirements.txt"), "w") as f:
+                f.writelines(compiled_lines(size))
+            rss, seconds = peak_rss(
+                command, "parse_requirements", [directory], {"stream": True}
+            )
+            results.append((size, rss, seconds))
+
+    print(f"{'requirements':>12}{'peak MB':>10}{'seconds':>10}")
+    for size, rss, seconds in results:
+        print(f"{size:>12}{rss:>10.1f}{seconds:>10.2f}")
+    growth = results[-1][1] - results[0][1]
+    print(f"grew {growth:.1f} MB, at most {max_growth_mb} MB allowed")
+    return growth <= max_growth_mb
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument(
+        "--command",
+        default=f"{shlex.quote(sys.executable)} run.py",
+        help="command that starts the helper, run from the helpers dir",
+    )
+    argparser.add_argument(
+        "--network",
+        action="store_true",
+        help="include get_dependency_hash, which queries PyPI",
+    )
+    argparser.add_argument(
+        "--json", action="store_true", help="print the results as JSON"
+    )
+    argparser.add_argument(
+        "--memory",
+        action="store_true",
+        help="check streaming large requirement files in bounded memory",
+    )
+    argparser.add_argument(
+        "--max-growth-mb",
+        type=float,
+        default=10,
+        help="how much more memory --memory allows for the largest file",
+    )
+    options = argparser.parse_args()
+    command = shlex.split(options.command)
+
+    if options.memory:
+        if not measure_memory(command, options.max_growth_mb):
+            sys.exit(1)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as workspace:
+        write_workspace(workspace)
+        server = subprocess.Popen(
+            command + ["--serve"], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            cwd=HELPERS_DIR,
+        )
+        try:
+            for label, function, args, call_options in calls(
+                workspace, options.network
+            ):
+                cold = time_cold(
+                    command, function, args, call_options, options.repeat
+                )
+                warm = time_warm(
+                    server, function, args, call_options, options.repeat
+                )
+                results.append({
+                    "function": label,
+                    "cold_ms": round(statistics.median(cold) * 1000, 1),
+                    "warm_ms": round(statistics.median(warm) * 1000, 1),
+                })
+        finally:
+            server.stdin.close()
+            server.wait()
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'function':<42}{'cold ms':>10}{'warm ms':>10}")
+    for result in results:
+        print(
+            f"{result['function']:<42}"
+            f"{result['cold_ms']:>10}{result['warm_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
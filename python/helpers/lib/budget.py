@@ -0,0 +1,59 @@
+"""Deadlines for helper calls.
+
+A request can carry a `deadline` option, the Unix time in seconds by which
+the caller needs a response. The helper functions check it between files
+and use what's left of it as their network timeouts, and answer with a
+`DeadlineExceeded` error and whatever they'd finished once it passes.
+"""
+import contextlib
+import signal
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining(deadline):
+    """Seconds left until `deadline`, or None when there isn't one."""
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check(deadline):
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded(f"The deadline passed at {deadline}")
+
+
+def timeout(deadline):
+    """The seconds left, raising `DeadlineExceeded` if there are none."""
+    check(deadline)
+    return remaining(deadline)
+
+
+@contextlib.contextmanager
+def alarm(deadline):
+    """Interrupt the block with `DeadlineExceeded` when the deadline passes.
+
+    This is for code that may never return, like a setup.py. Signals are
+    only delivered to the main thread, so elsewhere the deadline is only
+    checked on entry.
+    """
+    check(deadline)
+    if deadline is None or \
+            threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def interrupt(signum, frame):
+        raise DeadlineExceeded(f"The deadline passed at {deadline}")
+
+    previous = signal.signal(signal.SIGALRM, interrupt)
+    signal.setitimer(signal.ITIMER_REAL, max(remaining(deadline), 0.001))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
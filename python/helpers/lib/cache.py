@@ -0,0 +1,288 @@
+"""A persistent cache of parse results, per dependency file.
+
+Most jobs parse the same files as the previous run of the job. With a
+`cache` option the parse functions keep the records of each file in a
+SQLite database in that directory:
+
+    {"function": "parse_requirements", "args": ["/home/dependabot/project"],
+     "options": {"cache": {"path": "/tmp/helper-cache", "max_bytes": 1e8}}}
+
+`"cache": "/tmp/helper-cache"` uses the default size, and setting
+`DEPENDABOT_HELPER_CACHE_DIR` caches every call to a parse function.
+
+Entries are keyed by a digest of the helper version, the function, the
+file's path relative to the directory and its contents. An entry also holds
+digests of the other files that parsing it read, like `-r` and `-c`
+includes, and is only used if they haven't changed either. Files that
+failed to parse, or that include remote files, aren't cached. Once the
+database is larger than `max_bytes`, the least recently used entries are
+evicted.
+
+The response gets a `cache` block with the hits, misses and evictions of
+the call, and the totals for the database.
+"""
+import contextlib
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import platform
+import sqlite3
+import time
+
+ENVIRONMENT_VARIABLE = "DEPENDABOT_HELPER_CACHE_DIR"
+
+FUNCTIONS = {
+    "parse_requirements",
+    "parse_setup",
+    "parse_pep621_pep735_dependencies",
+}
+
+MAX_BYTES = 256 * 1024 * 1024
+
+# The records depend on the parser, the packages it hands parsing to and,
+# for setup.py, the Python version
+PARSER_PATHS = tuple(
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ("parser.py", "tokenizer.py")
+)
+PARSER_PACKAGES = ("pip", "packaging", "setuptools", "tomli")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+-- The number and size of the entries, kept as they change so that stores
+-- don't have to add them up
+INSERT OR IGNORE INTO counters (name, value)
+    SELECT 'entries', (SELECT COUNT(*) FROM entries)
+    WHERE NOT EXISTS (SELECT 1 FROM counters WHERE name = 'entries');
+INSERT OR IGNORE INTO counters (name, value)
+    SELECT 'bytes', (SELECT COALESCE(SUM(size), 0) FROM entries)
+    WHERE NOT EXISTS (SELECT 1 FROM counters WHERE name = 'bytes');
+CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'entries';
+    UPDATE counters SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_updated AFTER UPDATE OF size ON entries
+BEGIN
+    UPDATE counters SET value = value + NEW.size - OLD.size
+        WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'entries';
+    UPDATE counters SET value = value - OLD.size WHERE name = 'bytes';
+END;
+"""
+
+COUNTERS = ("hits", "misses", "evictions")
+
+
+@functools.lru_cache(maxsize=None)
+def helper_version():
+    version = hashlib.sha256(platform.python_version().encode())
+    for path in PARSER_PATHS:
+        with open(path, "rb") as f:
+            version.update(f.read())
+    for package in PARSER_PACKAGES:
+        try:
+            package_version = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            package_version = None
+        version.update(f"{package}=={package_version}\n".encode())
+    return version.hexdigest()
+
+
+def digest(*parts):
+    value = hashlib.sha256()
+    for part in parts:
+        value.update(part if isinstance(part, bytes) else part.encode())
+        value.update(b"\0")
+    return value.hexdigest()
+
+
+def file_digest(files, path):
+    try:
+        with files.open(path, "rb") as f:
+            return digest(f.read())
+    except OSError:
+        return None
+
+
+class Cache:
+    def __init__(self, connection, max_bytes=MAX_BYTES, directory=None):
+        self.connection = connection
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        # Counts of other processes working on the same call, which they
+        # have already added to the totals
+        self.absorbed = dict.fromkeys(COUNTERS, 0)
+        self.report = {}
+
+    def lookup(self, function, files, directory, path, name=None):
+        """Return the key for a file and its cache entry, or None.
+
+        The entry holds the file's `records`, and anything else that was
+        stored with them.
+
+        The key includes the file's path relative to `directory`, or `name`
+        for parse functions that put the path as it was given in records.
+        """
+        content_digest = file_digest(files, path)
+        if content_digest is None:
+            return None, None
+
+        key = digest(
+            helper_version(),
+            function,
+            os.path.relpath(path, directory) if name is None else name,
+            content_digest,
+        )
+        row = self.connection.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.counts["misses"] += 1
+            return key, None
+
+        entry = json.loads(row[0])
+        for include, expected in entry["includes"].items():
+            include = os.path.join(directory, include)
+            if file_digest(files, include) != expected:
+                self.counts["misses"] += 1
+                return key, None
+
+        self.connection.execute(
+            "UPDATE entries SET last_used = ? WHERE key = ?",
+            (time.time(), key),
+        )
+        self.counts["hits"] += 1
+        return key, entry
+
+    def store(self, key, records, files, directory, includes=(), **extra):
+        """Cache the records of a file, and the digests of its includes.
+
+        `extra` values, like the include graph of a requirements file, are
+        stored alongside the records.
+        """
+        if key is None:
+            return
+
+        digests = {}
+        for include in includes:
+            include_digest = file_digest(files, include)
+            if include_digest is None:
+                return
+            digests[os.path.relpath(include, directory)] = include_digest
+
+        value = json.dumps(
+            {"includes": digests, "records": records, **extra}
+        )
+        # An upsert rather than a replace, which wouldn't fire the delete
+        # trigger for the entry it replaces
+        self.connection.execute(
+            "INSERT INTO entries VALUES (?, ?, ?, ?) ON CONFLICT (key) DO "
+            "UPDATE SET value = excluded.value, size = excluded.size, "
+            "last_used = excluded.last_used",
+            (key, value, len(value), time.time()),
+        )
+        self.evict()
+
+    def total(self, name):
+        """The running `entries` or `bytes` total of the database."""
+        (value,) = self.connection.execute(
+            "SELECT value FROM counters WHERE name = ?", (name,)
+        ).fetchone()
+        return value
+
+    def storing(self, key, records, files, directory, errors=None):
+        """Pass on `records`, storing them once they've all parsed."""
+        failures = len(errors or ())
+        parsed = []
+        for record in records:
+            parsed.append(record)
+            yield record
+        if len(errors or ()) == failures:
+            self.store(key, parsed, files, directory)
+
+    def evict(self):
+        excess = self.total("bytes") - self.max_bytes
+        if excess <= 0:
+            return
+
+        evicted = []
+        rows = self.connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        )
+        for key, size in rows:
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        rows.close()
+        self.connection.executemany(
+            "DELETE FROM entries WHERE key = ?", evicted
+        )
+        self.counts["evictions"] += len(evicted)
+
+    def absorb(self, counts):
+        """Report the counts of another process's cache as this call's."""
+        for name, count in (counts or {}).items():
+            self.absorbed[name] += count
+
+    def close(self):
+        self.connection.executemany(
+            "INSERT INTO counters VALUES (?, ?) ON CONFLICT (name) "
+            "DO UPDATE SET value = value + excluded.value",
+            self.counts.items(),
+        )
+        totals = dict(self.connection.execute(
+            "SELECT name, value FROM counters"
+        ).fetchall())
+        self.connection.close()
+
+        self.report.update({
+            name: self.counts[name] + self.absorbed[name] for name in COUNTERS
+        })
+        self.report["total"] = {
+            "entries": totals["entries"],
+            "bytes": totals["bytes"],
+            **{name: totals.get(name, 0) for name in COUNTERS},
+        }
+
+
+def settings(option):
+    """The directory and size limit that a request's option asks for."""
+    if isinstance(option, dict):
+        return option["path"], int(option.get("max_bytes", MAX_BYTES))
+    if isinstance(option, str):
+        return option, MAX_BYTES
+    return os.environ.get(ENVIRONMENT_VARIABLE), MAX_BYTES
+
+
+@contextlib.contextmanager
+def opened(directory, max_bytes=MAX_BYTES):
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(
+        os.path.join(directory, "results.sqlite3"),
+        timeout=30,
+        isolation_level=None,
+    )
+    # Helper processes share the database
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    cache = Cache(connection, max_bytes, directory)
+    try:
+        yield cache
+    finally:
+        cache.close()
@@ -0,0 +1,254 @@
+"""Which pip-compile outputs pin what, and why, from their `# via` notes.
+
+pip-compile annotates every pin of the files it writes with what requires
+it, either on the pin's line or in a block under it:
+
+    certifi==2024.2.2         # via requests
+    requests==2.31.0
+        # via
+        #   -r requirements.in
+        #   -c constraints.txt
+
+`parse_pip_compile_graph` reads these into a reverse-dependency graph of
+the compiled files under a directory, keyed by their paths relative to it:
+
+    {"requirements.txt": {
+        "sources": ["requirements.in"],
+        "pins": {"certifi": {"version": "2024.2.2", "via": ["requests"]},
+                 "requests": {"version": "2.31.0",
+                              "via": ["-r requirements.in",
+                                      "-c constraints.txt"]}}}}
+
+Package names are normalized, and the files in `via` are the ones pip-compile
+was run with, relative to the directory it was run in. The sources come from
+the command in the file's header, or are the `.in` file of the same name.
+
+Given a `dependency` to bump, the response also lists the compiled files to
+recompile, in the order to compile them: the ones that pin the dependency,
+and the ones that take pins it can change from those with `-r` or `-c`.
+"""
+import json
+import os.path
+import re
+import shlex
+
+from lib import budget, discovery, spans, vfs
+
+# The header pip-compile writes, and the command in it
+HEADER_RE = re.compile(r"^#.*autogenerated by pip-compile")
+COMMAND_RE = re.compile(r"^#\s+pip-compile\b(?P<arguments>.*)$")
+
+# pip-compile's options that take a value as the next argument
+VALUE_OPTIONS = {
+    "-o", "--output-file", "-i", "--index-url", "--extra-index-url",
+    "-f", "--find-links", "--trusted-host", "-P", "--upgrade-package",
+    "--pip-args", "--resolver", "--cache-dir", "--extra", "-c",
+    "--constraint", "--unsafe-package", "--build-deps-for", "--config",
+    "--max-rounds", "--newline", "--annotation-style",
+}
+
+# A pin, and the `# via` note on the same line if there is one
+PIN_RE = re.compile(
+    r"^(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*"
+    r"(?:===?\s*(?P<version>[^\s;\\#]+))?"
+)
+INLINE_VIA_RE = re.compile(r"\s#\s*via\s+(?P<via>.+)$")
+# The comment lines of a block under a pin
+NOTE_RE = re.compile(r"^\s+#\s?(?P<note>.*)$")
+# `-r requirements.in (line 3)`, as older pip-compiles write it
+LINE_NUMBER_RE = re.compile(r"\s+\(line \d+\)$")
+# `-r requirements.in` and `-c constraints.txt`
+FILE_VIA_RE = re.compile(r"^-[rc]\s+(?P<path>.+)$")
+
+
+def normalize(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def via_entry(text):
+    """A package's normalized name, or the file as pip-compile wrote it."""
+    text = LINE_NUMBER_RE.sub("", text.strip())
+    if FILE_VIA_RE.match(text):
+        return text
+    # `my-project (setup.py)`, and the like
+    return normalize(text.split()[0])
+
+
+def command_sources(line):
+    """The files a pip-compile command in a header compiles."""
+    match = COMMAND_RE.match(line)
+    if match is None:
+        return None
+    try:
+        arguments = shlex.split(match.group("arguments"))
+    except ValueError:
+        return None
+    sources = []
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument in VALUE_OPTIONS:
+            next(arguments, None)
+        elif not argument.startswith("-"):
+            sources.append(os.path.normpath(argument))
+    return sources
+
+
+def compiled_file(files, path):
+    """The sources and pins of a compiled file, or None if it isn't one."""
+    sources = None
+    pins = {}
+    pin = None
+    block = False
+    compiled = False
+
+    with files.open(path) as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if HEADER_RE.match(line):
+                compiled = True
+            if sources is None and pin is None and line.startswith("#"):
+                sources = command_sources(line)
+                continue
+
+            # Notes, and the `--hash` lines the notes can follow
+            if line[:1].isspace():
+                note = NOTE_RE.match(line)
+                if pin is None or note is None:
+                    continue
+                note = note.group("note").strip()
+                if note == "via":
+                    block = True
+                elif note.startswith("via "):
+                    pin["via"].append(via_entry(note[4:]))
+                elif block and note:
+                    pin["via"].append(via_entry(note))
+                continue
+
+            pin = None
+            block = False
+            match = PIN_RE.match(line)
+            if match is None:
+                continue
+            pin = pins.setdefault(
+                normalize(match.group("name")),
+                {"version": match.group("version"), "via": []},
+            )
+            via = INLINE_VIA_RE.search(line)
+            if via is not None:
+                pin["via"].extend(
+                    via_entry(entry)
+                    for entry in via.group("via").split(",")
+                )
+
+    if not compiled and not any(pin["via"] for pin in pins.values()):
+        return None
+    return {"sources": sources, "pins": pins}
+
+
+def changed_pins(pins, seeds):
+    """The pins a recompile can change, when it changes `seeds`."""
+    dependents = {}
+    for name, pin in pins.items():
+        for parent in pin["via"]:
+            dependents.setdefault(parent, []).append(name)
+
+    changed = set()
+    pending = [seed for seed in seeds if seed in pins]
+    while pending:
+        name = pending.pop()
+        if name in changed:
+            continue
+        changed.add(name)
+        pending.extend(dependents.get(name, ()))
+    return changed
+
+
+def referenced_files(pins):
+    """The files pins come from with `-r` or `-c`, and the pins of each."""
+    references = {}
+    for name, pin in pins.items():
+        for parent in pin["via"]:
+            match = FILE_VIA_RE.match(parent)
+            if match is not None:
+                path = os.path.normpath(match.group("path"))
+                references.setdefault(path, set()).add(name)
+    return references
+
+
+def recompile_order(graph, dependency):
+    """The compiled files to recompile to bump `dependency`, in order."""
+    dependency = normalize(dependency)
+    references = {
+        path: referenced_files(compiled["pins"])
+        for path, compiled in graph.items()
+    }
+
+    # The pins each file's recompile can change, growing as pins a file
+    # takes from another one turn out to change with it
+    changed = {}
+    updated = True
+    while updated:
+        updated = False
+        for path, compiled in graph.items():
+            seeds = {dependency}
+            for other, names in references[path].items():
+                seeds |= names & changed.get(other, set())
+            pins = changed_pins(compiled["pins"], seeds)
+            if pins and pins != changed.get(path):
+                changed[path] = pins
+                updated = True
+
+    # Files that take pins from another one are compiled after it
+    ordered = []
+    remaining = sorted(changed)
+    while remaining:
+        ready = [
+            path for path in remaining
+            if not any(
+                other in remaining and other != path
+                for other in references[path]
+            )
+        ] or remaining[:1]
+        ordered.extend(ready)
+        remaining = [path for path in remaining if path not in ready]
+    return ordered
+
+
+def parse_pip_compile_graph(directory, dependency=None, files=None,
+                            deadline=None, max_depth=discovery.MAX_DEPTH,
+                            ignore=()):
+    """The reverse-dependency graph of the pip-compile outputs in a directory.
+
+    With a `dependency`, the response's `recompile` lists the outputs to
+    recompile to bump it, with the sources to compile each from.
+    """
+    files = vfs.Files(directory, files)
+    graph = {}
+    with spans.span("discover requirement files"):
+        paths = discovery.requirement_files(
+            files, directory, max_depth, ignore
+        )
+
+    for path in paths:
+        budget.check(deadline)
+        if not path.endswith(".txt"):
+            continue
+        with spans.span("read pip-compile annotations", file=path):
+            compiled = compiled_file(files, path)
+        if compiled is None:
+            continue
+        name = os.path.relpath(path, directory)
+        if not compiled["sources"]:
+            source = os.path.splitext(path)[0] + ".in"
+            compiled["sources"] = [
+                os.path.relpath(source, directory)
+            ] if files.isfile(source) else []
+        graph[name] = compiled
+
+    response = {"result": graph}
+    if dependency is not None:
+        response["recompile"] = [
+            {"file": path, "sources": graph[path]["sources"]}
+            for path in recompile_order(graph, dependency)
+        ]
+    return json.dumps(response)
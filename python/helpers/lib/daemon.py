@@ -0,0 +1,166 @@
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import signal
+
+from lib import dispatcher, prefork
+
+# Functions that spend their time waiting on package indexes. They run on a
+# thread pool in the daemon process; everything else is CPU-bound parsing
+# and runs on a process pool.
+NETWORK_BOUND = {"get_dependency_hash"}
+
+# Requests are single lines of JSON and may carry whole file contents
+LINE_LIMIT = 64 * 1024 * 1024
+
+
+def handle_network_bound(request):
+    """Handle a request on a daemon thread and return its output lines.
+
+    `dispatcher.handle` swaps `sys.stdout` to capture helpers that print, which
+    isn't thread-safe. The network-bound helpers return their response
+    instead, so call them directly.
+    """
+    try:
+        response = json.loads(dispatcher.invoke(
+            request["function"],
+            request.get("args", []),
+            request.get("options"),
+        ))
+    except Exception as e:
+        response = dispatcher.error_response(e)
+
+    response["id"] = request.get("id")
+    return [response]
+
+
+def handle_cpu_bound(request):
+    # Output lines are sent back from the pool worker once it's done
+    lines = []
+    # Pool workers are reused, so setup.py still needs its own child
+    if request.get("function") == "parse_setup":
+        prefork.handle_in_child(request, lines.append)
+    else:
+        dispatcher.handle(request, lines.append)
+    return lines
+
+
+class ProcessPool:
+    """A process pool that starts over when one of its workers dies.
+
+    A worker that crashes breaks a `ProcessPoolExecutor` for good, so the
+    requests it was running fail and the pool is replaced for the rest.
+    """
+
+    def __init__(self, processes=None, context=None):
+        self.processes = processes
+        self.context = context
+        self.executor = self.start()
+
+    def start(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            self.processes, mp_context=self.context
+        )
+
+    async def run(self, handler, request):
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, handler, request
+            )
+        except concurrent.futures.process.BrokenProcessPool:
+            # Requests that were running alongside fail the same way, and
+            # only the first one replaces the pool
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = self.start()
+            raise
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+async def run(path, threads=None, processes=None):
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(prefork.PRELOAD)
+    thread_pool = concurrent.futures.ThreadPoolExecutor(threads)
+    process_pool = ProcessPool(processes, context)
+    loop = asyncio.get_running_loop()
+
+    async def respond(request, writer):
+        try:
+            if request.get("function") in NETWORK_BOUND:
+                lines = await loop.run_in_executor(
+                    thread_pool, handle_network_bound, request
+                )
+            else:
+                lines = await process_pool.run(handle_cpu_bound, request)
+        except Exception as e:
+            response = dispatcher.error_response(e)
+            response["id"] = request.get("id")
+            lines = [response]
+
+        output = "".join(json.dumps(line) + "\n" for line in lines)
+        writer.write(output.encode())
+        await writer.drain()
+
+    async def handle_connection(reader, writer):
+        # Requests on one connection are answered as soon as each finishes,
+        # so clients must match responses to requests by `id`
+        in_flight = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+
+            try:
+                request = dispatcher.decode_request(line)
+            except ValueError as e:
+                response = dispatcher.error_response(e)
+                response["id"] = None
+                writer.write((json.dumps(response) + "\n").encode())
+                continue
+
+            task = asyncio.ensure_future(respond(request, writer))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        await asyncio.gather(*in_flight)
+        writer.close()
+
+    # Stopping is handled before the socket exists, so that a signal can't
+    # end the process and leave the socket behind
+    stopped = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+
+    if os.path.exists(path):
+        os.unlink(path)
+
+    # Clients can have the daemon run any setup.py, so only its own user
+    # may connect. The socket is created without permissions for anyone
+    # else rather than changed after, which would leave a window open.
+    umask = os.umask(0o177)
+    try:
+        server = await asyncio.start_unix_server(
+            handle_connection, path, limit=LINE_LIMIT
+        )
+    finally:
+        os.umask(umask)
+
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        thread_pool.shutdown()
+        process_pool.shutdown()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def serve(path, threads=None, processes=None):
+    asyncio.run(run(path, threads, processes))
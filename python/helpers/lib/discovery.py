@@ -0,0 +1,141 @@
+"""Find the requirement files under a directory in a single walk.
+
+`parse_requirements` parses the `*.txt` and `*.in` files in its directory
+and, by default, the directories directly below it. A request can look
+deeper, or less deep, with `max_depth`, where null means no limit, and skip
+paths with `ignore` globs, which are matched against paths relative to the
+directory and against file and directory names:
+
+    {"function": "parse_requirements", "args": ["/home/dependabot/project"],
+     "options": {"max_depth": null, "ignore": ["docs", "tests/*.txt"]}}
+
+Like the globs this replaces, hidden files and directories are skipped. The
+walk also skips directories that hold installed packages rather than a
+project's own files, see `PRUNED`. Files are returned with the `*.txt`
+files first, then the `*.in` files, each in the order of the walk, which
+sorts every directory's entries.
+
+Before pip parses a `*.txt` file, `sniff` reads its first lines to check
+that it looks like a requirements or constraints file, so that the likes of
+a LICENSE.txt or robots.txt are skipped rather than failing the call. The
+skipped files are listed in the response with the reason for each:
+
+    "skipped": [{"file": "LICENSE.txt",
+                 "reason": "line 1 doesn't look like a requirement"}]
+
+`"prefilter": false` parses every file found.
+"""
+import fnmatch
+import os.path
+import re
+
+EXTENSIONS = (".txt", ".in")
+
+MAX_DEPTH = 1
+
+# Directories of installed packages. Virtualenvs are found by their
+# `pyvenv.cfg`, whatever they're called.
+PRUNED = {"node_modules", "site-packages", "__pycache__"}
+
+# How many lines `sniff` reads
+SNIFF_LINES = 20
+
+# Files named like these are parsed without sniffing them
+REQUIREMENTS_NAME_RE = re.compile(r"requirements|constraints", re.IGNORECASE)
+
+# A project name, optionally with extras, followed by what can follow one
+REQUIREMENT_RE = re.compile(
+    r"^[A-Za-z0-9][A-Za-z0-9._-]*\s*(\[[^\]]*\])?\s*"
+    r"($|\s+--?[A-Za-z]|[<>=!~;@,(#\\])"
+)
+
+
+def ignored(relative_path, patterns):
+    name = os.path.basename(relative_path)
+    return any(
+        fnmatch.fnmatchcase(relative_path, pattern) or
+        fnmatch.fnmatchcase(name, pattern)
+        for pattern in patterns
+    )
+
+
+def pruned(files, path, name, relative_path, patterns):
+    return (
+        name.startswith(".") or
+        name in PRUNED or
+        ignored(relative_path, patterns) or
+        files.isfile(os.path.join(path, name, "pyvenv.cfg"))
+    )
+
+
+def requirement_files(files, directory, max_depth=MAX_DEPTH, ignore=()):
+    """The paths of the requirement files under `directory`."""
+    found = {extension: [] for extension in EXTENSIONS}
+    for path, dirnames, filenames in files.walk(directory):
+        relative_directory = os.path.relpath(path, directory)
+        if relative_directory == os.curdir:
+            relative_directory = ""
+            depth = 0
+        else:
+            depth = relative_directory.count(os.sep) + 1
+
+        if max_depth is not None and depth >= max_depth:
+            dirnames[:] = []
+        else:
+            dirnames[:] = sorted(
+                name for name in dirnames
+                if not pruned(
+                    files,
+                    path,
+                    name,
+                    os.path.join(relative_directory, name),
+                    ignore,
+                )
+            )
+
+        for name in sorted(filenames):
+            extension = os.path.splitext(name)[1]
+            if extension not in found or name.startswith("."):
+                continue
+            if ignored(os.path.join(relative_directory, name), ignore):
+                continue
+            found[extension].append(os.path.join(path, name))
+
+    return [path for extension in EXTENSIONS for path in found[extension]]
+
+
+def plausible(line):
+    """Whether a stripped line could be part of a requirements file."""
+    return (
+        line.startswith(("#", "-", ".", "/", "~")) or
+        "://" in line or
+        REQUIREMENT_RE.match(line) is not None
+    )
+
+
+def sniff(files, path):
+    """Why a file shouldn't be parsed as requirements, or None if it can be.
+
+    Only `*.txt` files are sniffed, and only their first `SNIFF_LINES`
+    lines are read.
+    """
+    name = os.path.basename(path)
+    if not name.endswith(".txt") or REQUIREMENTS_NAME_RE.search(name):
+        return None
+
+    continued = False
+    with files.open(path, "rb") as f:
+        for number, line in enumerate(f, 1):
+            if number > SNIFF_LINES:
+                break
+            if b"\0" in line:
+                return "binary file"
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError:
+                line = line.decode("latin-1")
+            line = line.lstrip("\ufeff").strip()
+            if line and not continued and not plausible(line):
+                return f"line {number} doesn't look like a requirement"
+            continued = line.endswith("\\")
+    return None
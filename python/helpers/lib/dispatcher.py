@@ -0,0 +1,217 @@
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+
+# Functions are looked up by module name so that a call only imports the
+# modules it needs. Keep heavy imports out of the light paths, see
+# test/test_imports.py.
+FUNCTIONS = {
+    "parse_requirements": "lib.parser",
+    "parse_setup": "lib.parser",
+    "parse_pep621_pep735_dependencies": "lib.parser",
+    "parse_pip_compile_graph": "lib.compiled",
+    "get_dependency_hash": "lib.hasher",
+    "get_pipfile_hash": "lib.hasher",
+    "get_pyproject_hash": "lib.hasher",
+}
+
+# The python and uv ecosystems share these helpers. The functions whose
+# results differ between them take an `ecosystem` option, which defaults to
+# this environment variable and then to "python", see `lib.parser`.
+ECOSYSTEM_VARIABLE = "DEPENDABOT_HELPER_ECOSYSTEM"
+ECOSYSTEM_FUNCTIONS = {"parse_pep621_pep735_dependencies"}
+
+
+def resolve(function):
+    return getattr(importlib.import_module(FUNCTIONS[function]), function)
+
+
+def error_response(e):
+    return {"error": repr(e), "error_class": e.__class__.__name__}
+
+
+def keyword_arguments(options, emit=None):
+    """Translate the `options` of a request into keyword arguments.
+
+    `"stream": true` asks a parse function to pass each dependency record to
+    `emit` as soon as it's parsed rather than returning them all at once.
+    Other options, like `files`, `keep_going` and `deadline`, are passed on
+    as they are.
+    """
+    kwargs = dict(options or {})
+    if kwargs.pop("stream", False):
+        if emit is None:
+            raise ValueError("Streaming isn't supported for this request")
+        kwargs["emit"] = emit
+    return kwargs
+
+
+def invoke(function, args, options=None, emit=None):
+    """Call a helper function with the options of a request.
+
+    Returns the function's JSON output. `"metrics": true`, or a dict of
+    settings, adds a `metrics` block with the call's resource usage to it,
+    see `lib.metrics`. `"trace": path` writes spans for the phases of the
+    call to `path`, see `lib.spans`. `"profile": true` runs the call under
+    cProfile and adds a `profile` block, see `lib.profiling`. `"cache":
+    path` keeps parse results in a cache in `path`, see `lib.cache`.
+    `"ecosystem": "uv"` is only passed to the functions that need it, so a
+    process serving both ecosystems can send it with every request.
+    """
+    options = dict(options or {})
+    measured = options.pop("metrics", False)
+    trace_path = options.pop("trace", None)
+    profiling = options.pop("profile", False)
+    caching = options.pop("cache", None)
+    ecosystem = options.pop("ecosystem", None) or \
+        os.environ.get(ECOSYSTEM_VARIABLE)
+    reports = {}
+
+    with contextlib.ExitStack() as stack:
+        if trace_path is not None:
+            from lib import spans
+            stack.enter_context(spans.recording(trace_path))
+            stack.enter_context(spans.span(function))
+        if measured:
+            from lib import metrics
+            trace_allocations = isinstance(measured, dict) and \
+                measured.get("tracemalloc", False)
+            reports["metrics"] = stack.enter_context(
+                metrics.measure(trace_allocations)
+            )
+        kwargs = keyword_arguments(options, emit)
+        if ecosystem and function in ECOSYSTEM_FUNCTIONS:
+            kwargs["ecosystem"] = ecosystem
+        # The environment variables are `ENVIRONMENT_VARIABLE` in
+        # `lib.cache` and `lib.profiling`, checked here so that other calls
+        # don't import them
+        if caching or os.environ.get("DEPENDABOT_HELPER_CACHE_DIR"):
+            from lib import cache
+            directory, max_bytes = cache.settings(caching)
+            if function in cache.FUNCTIONS:
+                kwargs["cache"] = stack.enter_context(
+                    cache.opened(directory, max_bytes)
+                )
+                reports["cache"] = kwargs["cache"].report
+        if profiling or os.environ.get("DEPENDABOT_HELPER_PROFILE_DIR"):
+            from lib import profiling as profiler
+            path = profiler.dump_path(function, profiling)
+            reports["profile"] = stack.enter_context(profiler.profiled(path))
+
+        output = resolve(function)(*args, **kwargs)
+
+    if not reports:
+        return output
+
+    response = json.loads(output)
+    response.update(reports)
+    return json.dumps(response)
+
+
+def call(function, args, options=None, emit=None):
+    """Run a helper function in-process and return its decoded response.
+
+    The helper functions were written for a process that handles a single
+    request, so some of them print an error and `exit(1)`. Capture their
+    output and the exit so that a long-lived process survives them. The
+    `exit` builtin also closes `sys.stdin`, so hand it a throwaway stream.
+    """
+    if function == "batch":
+        return batch(args)
+    if function not in FUNCTIONS:
+        return {"error": f"Unknown function: {function}"}
+
+    buffer = io.StringIO()
+    stdin = sys.stdin
+    try:
+        sys.stdin = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            output = invoke(function, args, options, emit)
+    except SystemExit:
+        lines = buffer.getvalue().strip().splitlines()
+        output = lines[-1] if lines else json.dumps(
+            {"error": f"{function} exited without a response"}
+        )
+    except Exception as e:
+        return error_response(e)
+    finally:
+        sys.stdin = stdin
+
+    return json.loads(output)
+
+
+def batch(calls):
+    """Run a list of `{"function", "args"}` calls in order.
+
+    The result holds one response per call, each with its own `result` or
+    `error`, so a failing call doesn't discard the others.
+    """
+    return {
+        "result": [
+            call(c.get("function"), c.get("args", []), c.get("options"))
+            for c in calls
+        ]
+    }
+
+
+def check_request(request):
+    """Raise a `ValueError` unless a decoded request is a JSON object."""
+    if not isinstance(request, dict):
+        raise ValueError(
+            f"Requests must be JSON objects, not {type(request).__name__}"
+        )
+
+
+def decode_request(line):
+    """The request on a line of input, see `check_request`."""
+    request = json.loads(line)
+    check_request(request)
+    return request
+
+
+def handle(request, write):
+    """Handle one request, passing each line of its output to `write`.
+
+    Streamed records carry the `id` of the request, like its response does.
+    """
+    request_id = request.get("id")
+
+    def emit(record):
+        write(dict(record, id=request_id))
+
+    response = call(
+        request.get("function"),
+        request.get("args", []),
+        request.get("options"),
+        emit,
+    )
+    response["id"] = request_id
+    write(response)
+
+
+def serve(stdin, stdout, handler=handle):
+    """Answer newline-delimited JSON requests until stdin is closed.
+
+    Each request is an object with an `id`, a `function`, its `args` and
+    optionally `options`. Exactly one response line carrying the same `id`
+    is written per request, after any records streamed for it.
+    """
+    def write(response):
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+    for line in stdin:
+        if not line.strip():
+            continue
+
+        try:
+            request = decode_request(line)
+        except ValueError as e:
+            response = error_response(e)
+            response["id"] = None
+            write(response)
+        else:
+            handler(request, write)
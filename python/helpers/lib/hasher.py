@@ -1,22 +1,95 @@
-import hashin
+import hashlib
 import json
-import plette
+import os.path
+import pathlib
 import ssl
 import traceback
-from urllib.error import URLError
-from poetry.factory import Factory
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin
+from urllib.request import urlopen
+
+# hashin, plette and poetry are each only needed by one function, so they're
+# imported by the functions that need them.
+from lib import budget, spans, vfs
+
+
+def deadline_exceeded(e):
+    return json.dumps({"error": repr(e), "error_class": e.__class__.__name__})
+
+
+def download(url, deadline, description):
+    """The content at `url`, timing out at the deadline as hashin wouldn't."""
+    import hashin
+
+    try:
+        with spans.span(description, url=url), \
+                urlopen(url, timeout=budget.timeout(deadline)) as response:
+            return response.read()
+    except HTTPError as e:
+        if e.code == 404:
+            raise hashin.PackageNotFoundError(url)
+        raise hashin.PackageError(f"Download error. {e.code} on {url}")
+    except (TimeoutError, URLError) as e:
+        if isinstance(getattr(e, "reason", e), TimeoutError):
+            raise budget.DeadlineExceeded(f"Timed out fetching {url}") from e
+        raise
+
+
+def get_package_data(package, index_url, deadline):
+    """Like `hashin.get_package_data`, but times out at the deadline."""
+    import hashin
+
+    url = urljoin(index_url, "/pypi/%s/json" % package)
+    content = json.loads(download(url, deadline, "fetch package data"))
+    if "releases" not in content:
+        raise hashin.PackageError("package JSON is not sane")
+    return content
+
+
+def add_missing_digests(data, version, algorithm, deadline):
+    """Hash the files the index has no `algorithm` digest for.
+
+    hashin downloads them without a timeout, so this downloads them first
+    and adds their digests, leaving hashin nothing to fetch.
+    """
+    import hashin
+
+    if not version:
+        version = hashin.get_latest_version(data, False)
+    for release in data["releases"].get(version, []):
+        digests = release.setdefault("digests", {})
+        if algorithm not in digests:
+            content = download(release["url"], deadline, "fetch release")
+            digests[algorithm] = hashlib.new(algorithm, content).hexdigest()
 
 
 def get_dependency_hash(dependency_name, dependency_version, algorithm,
-                        index_url=hashin.DEFAULT_INDEX_URL):
+                        index_url=None, deadline=None):
+    import hashin
+
+    if index_url is None:
+        index_url = hashin.DEFAULT_INDEX_URL
+
     try:
-        hashes = hashin.get_package_hashes(
-            dependency_name,
-            version=dependency_version,
-            algorithm=algorithm,
-            index_url=index_url
-        )
+        kwargs = {}
+        if deadline is not None:
+            # hashin has no timeouts, so fetch what it would download for it
+            data = get_package_data(dependency_name, index_url, deadline)
+            add_missing_digests(
+                data, dependency_version, algorithm, deadline
+            )
+            kwargs["lookup_memory"] = {dependency_name: data}
+        with spans.span("hashin.get_package_hashes", index_url=index_url):
+            hashes = hashin.get_package_hashes(
+                dependency_name,
+                version=dependency_version,
+                algorithm=algorithm,
+                index_url=index_url,
+                **kwargs
+            )
         return json.dumps({"result": hashes["hashes"]})
+    except budget.DeadlineExceeded as e:
+        return deadline_exceeded(e)
     except hashin.PackageNotFoundError as e:
         return json.dumps({
             "error": repr(e),
@@ -36,14 +109,48 @@ def get_dependency_hash(dependency_name, dependency_version, algorithm,
         raise
 
 
-def get_pipfile_hash(directory):
-    with open(directory + '/Pipfile') as f:
+def get_pipfile_hash(directory, files=None, deadline=None):
+    try:
+        budget.check(deadline)
+    except budget.DeadlineExceeded as e:
+        return deadline_exceeded(e)
+
+    import plette
+
+    files = vfs.Files(directory, files)
+    with files.open(directory + '/Pipfile') as f:
         pipfile = plette.Pipfile.load(f)
 
     return json.dumps({"result": pipfile.get_hash().value})
 
 
-def get_pyproject_hash(directory):
-    p = Factory().create_poetry(directory)
+def get_pyproject_hash(directory, files=None, deadline=None):
+    from poetry.factory import Factory
+    from poetry.packages.locker import Locker
+
+    files = vfs.Files(directory, files)
+    if not files.in_memory:
+        try:
+            with budget.alarm(deadline), \
+                    spans.span("Factory().create_poetry"):
+                p = Factory().create_poetry(directory)
+        except budget.DeadlineExceeded as e:
+            return deadline_exceeded(e)
+        return json.dumps({"result": p.locker._get_content_hash()})
+
+    # The hash only depends on the pyproject.toml, so there's no need for
+    # poetry to load the whole project from disk
+    import tomli
+
+    try:
+        budget.check(deadline)
+    except budget.DeadlineExceeded as e:
+        return deadline_exceeded(e)
+    pyproject_path = os.path.join(directory, "pyproject.toml")
+    with files.open(pyproject_path, "rb") as f:
+        with spans.span("tomli.load", file=pyproject_path):
+            pyproject = tomli.load(f)
+    lock_path = os.path.join(directory, "poetry.lock")
+    locker = Locker(pathlib.Path(lock_path), pyproject)
 
-    return json.dumps({"result": p.locker._get_content_hash()})
+    return json.dumps({"result": locker._get_content_hash()})
@@ -0,0 +1,195 @@
+"""Resource usage of a helper call.
+
+A request with `"metrics": true` gets a `metrics` block in its response:
+
+    {
+      "wall_ms": 412.3,
+      "cpu_ms": 398.1,
+      "import_ms": 251.0,
+      "peak_rss_kb": 61232,
+      "tracemalloc_peak_kb": 10240.5,
+      "files": {"read": 4, "bytes": 1893},
+      "network": {"requests": 1, "bytes_sent": 187, "bytes_received": 20311}
+    }
+
+`peak_rss_kb` is the high-water mark of the whole process, so in a
+long-lived helper it can come from an earlier call. Files and network
+traffic are only counted for the thread that makes the call, and calls on
+several threads at once are each counted apart.
+
+Tracing allocations makes imports several times slower, which would make
+the times meaningless, so `tracemalloc_peak_kb` is null unless the request
+asks for `"metrics": {"tracemalloc": true}`.
+"""
+import builtins
+import contextlib
+import http.client
+import importlib._bootstrap
+import os
+import resource
+import socket
+import ssl
+import threading
+import time
+import tracemalloc
+
+
+# The totals of the calls being measured, by thread. The hooks that count
+# into them are installed when the first call starts and removed when the
+# last one ends, so calls measured at once on the daemon's threads don't
+# undo each other's hooks.
+lock = threading.Lock()
+measured = {}
+hooks = []
+# How many of the calls trace allocations, and whether they started tracing
+tracers = {"count": 0, "started": False}
+
+
+def current():
+    return measured.get(threading.get_ident())
+
+
+def timed_import(find_and_load):
+    # Only time the outermost import, which includes the nested ones
+    def _find_and_load(*args, **kwargs):
+        totals = current()
+        if totals is None or totals["import_depth"]:
+            return find_and_load(*args, **kwargs)
+        totals["import_depth"] += 1
+        start = time.perf_counter()
+        try:
+            return find_and_load(*args, **kwargs)
+        finally:
+            totals["import_depth"] -= 1
+            totals["import_seconds"] += time.perf_counter() - start
+    return _find_and_load
+
+
+def counted_open(open_):
+    def open(file, mode="r", *args, **kwargs):
+        f = open_(file, mode, *args, **kwargs)
+        totals = current()
+        if totals is not None and not set("wax+") & set(mode):
+            totals["files_read"] += 1
+            with contextlib.suppress(OSError, ValueError):
+                totals["file_bytes"] += os.fstat(f.fileno()).st_size
+        return f
+    return open
+
+
+def counted(key, amount):
+    def wrapper(method):
+        def counted_method(*args, **kwargs):
+            result = method(*args, **kwargs)
+            totals = current()
+            if totals is not None:
+                totals[key] += amount(args, result)
+            return result
+        return counted_method
+    return wrapper
+
+
+def sent(args, result):
+    data = args[1]
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    return 0
+
+
+def install_hooks():
+    def patch(owner, name, wrapper):
+        original = getattr(owner, name)
+        setattr(owner, name, wrapper(original))
+        hooks.append((owner, name, original))
+
+    patch(importlib._bootstrap, "_find_and_load", timed_import)
+    patch(builtins, "open", counted_open)
+    patch(
+        http.client.HTTPConnection,
+        "putrequest",
+        counted("requests", lambda args, result: 1),
+    )
+    patch(http.client.HTTPConnection, "send", counted("bytes_sent", sent))
+    for socket_class in (socket.socket, ssl.SSLSocket):
+        patch(
+            socket_class,
+            "recv_into",
+            counted("bytes_received", lambda args, result: result or 0),
+        )
+
+
+def remove_hooks():
+    while hooks:
+        owner, name, original = hooks.pop()
+        setattr(owner, name, original)
+
+
+@contextlib.contextmanager
+def measure(trace_allocations=False):
+    """Measure the block, filling in the yielded report when it exits."""
+    report = {}
+    totals = {
+        "import_seconds": 0.0,
+        "import_depth": 0,
+        "files_read": 0,
+        "file_bytes": 0,
+        "requests": 0,
+        "bytes_sent": 0,
+        "bytes_received": 0,
+    }
+    thread = threading.get_ident()
+
+    with lock:
+        if not measured:
+            install_hooks()
+        outer = measured.get(thread)
+        measured[thread] = totals
+        if trace_allocations:
+            if not tracers["count"] and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                tracers["started"] = True
+            else:
+                # The peak is the process's, so with calls tracing at once
+                # it can come from another one
+                tracemalloc.reset_peak()
+            tracers["count"] += 1
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    try:
+        yield report
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        with lock:
+            allocated = None
+            if trace_allocations:
+                allocated = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                tracers["count"] -= 1
+                if not tracers["count"] and tracers["started"]:
+                    tracemalloc.stop()
+                    tracers["started"] = False
+            if outer is None:
+                del measured[thread]
+            else:
+                measured[thread] = outer
+            if not measured:
+                remove_hooks()
+
+        report.update({
+            "wall_ms": round(wall * 1000, 1),
+            "cpu_ms": round(cpu * 1000, 1),
+            "import_ms": round(totals["import_seconds"] * 1000, 1),
+            "peak_rss_kb":
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "tracemalloc_peak_kb": allocated,
+            "files": {
+                "read": totals["files_read"],
+                "bytes": totals["file_bytes"],
+            },
+            "network": {
+                "requests": totals["requests"],
+                "bytes_sent": totals["bytes_sent"],
+                "bytes_received": totals["bytes_received"],
+            },
+        })
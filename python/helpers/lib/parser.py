@@ -1,31 +1,216 @@
-import glob
+import codecs
+import contextlib
 import io
 import json
 import os.path
 import re
+import sys
+import sysconfig
+import threading
+import traceback
+import urllib.parse
 
-import configparser
-import setuptools
-import pip._internal.req.req_file
-from pip._internal.network.session import PipSession
-from pip._internal.req.constructors import (
-    install_req_from_line,
-    install_req_from_parsed_requirement,
-)
-
+# pip and setuptools are imported by the functions that need them, so that
+# parsing a pyproject.toml only pays for `tomli` and `packaging`.
 from packaging.requirements import InvalidRequirement, Requirement
 # TODO: Replace 3p package `tomli` with 3.11's new stdlib `tomllib` once we
 #       drop support for Python 3.10.
 import tomli
 
+from lib import budget, discovery, spans, vfs
+
 # Inspired by pips internal check:
 # https://github.com/pypa/pip/blob/0bb3ac87f5bb149bd75cceac000844128b574385/src/pip/_internal/req/req_file.py#L35
 COMMENT_RE = re.compile(r'(^|\s+)#.*$')
 
+# The python and uv file parsers share these helpers but label the
+# requirement types of a pyproject.toml differently. `optional` is whether
+# optional dependencies are labelled with their group's name, and
+# `uv_sources` whether `tool.uv.sources` path dependencies are returned.
+ECOSYSTEMS = {
+    "python": {
+        "dependencies": "dependencies",
+        "optional": True,
+        "build_system": "build-system.requires",
+        "uv_sources": False,
+    },
+    "uv": {
+        "dependencies": None,
+        "optional": False,
+        "build_system": "build-system",
+        "uv_sources": True,
+    },
+}
+
+
+class ParserError(Exception):
+    """An error that's reported in the helper's response.
+
+    Anything else is left to fail the helper with a traceback, unless the
+    parse function is keeping going, see `collect`.
+    """
+
+    def __init__(self, error, file=None, line=None):
+        super().__init__(error)
+        self.error = error
+        self.file = file
+        self.line = line
+
+    def __reduce__(self):
+        # Keep the file and line when passed back from a worker process
+        return ParserError, (self.error, self.file, self.line)
+
+
+def error_record(e):
+    return {
+        "error": repr(e.error),
+        "error_class": e.error.__class__.__name__,
+        "file": e.file,
+        "line": e.line,
+    }
+
+
+def collect(records, emit=None, schema=1, errors=None, blocks=None):
+    """Build the response for the dependency records of a parse function.
+
+    By default this is a single JSON document holding every record. When
+    `emit` is given, each record is passed to it as soon as it's parsed
+    instead, and the response is a trailer holding the errors and a summary.
+    `schema=2` returns the result in the compact schema of `lib.schema`.
+
+    When `errors` is a list, the records generator appends a `ParserError`
+    to it for each file or requirement that fails and keeps going, and the
+    response holds the errors alongside the partial result.
+
+    When the records generator runs out of time, the records so far are
+    returned with a `DeadlineExceeded` error.
+
+    `blocks` are added to the response as they are once the records
+    generator is done, like the files it skipped, leaving out empty ones.
+    """
+    if schema not in (1, 2):
+        raise ValueError(f"Unknown schema: {schema}")
+    if schema == 2 and emit is not None:
+        raise ValueError("The compact schema can't be streamed")
+
+    dependencies = []
+    keep_going = errors is not None
+    errors = [] if errors is None else errors
+    files = set()
+    count = 0
+    exceeded = None
+
+    try:
+        for record in records:
+            if emit is None:
+                dependencies.append(record)
+            else:
+                emit(record)
+                files.add(record["file"])
+                count += 1
+    except ParserError as e:
+        if emit is None:
+            print(json.dumps({"error": repr(e.error)}))
+            exit(1)
+        errors.append(e)
+    except budget.DeadlineExceeded as e:
+        exceeded = e
+        if emit is not None:
+            errors.append(ParserError(e))
+
+    errors = [error_record(e) for e in errors]
+
+    if emit is not None:
+        trailer = {
+            "errors": errors,
+            "summary": {"dependencies": count, "files": len(files)},
+        }
+        trailer.update({k: v for k, v in (blocks or {}).items() if v})
+        return json.dumps(trailer)
+
+    response = {"result": dependencies}
+    response.update({k: v for k, v in (blocks or {}).items() if v})
+    separators = None
+    if schema == 2:
+        from lib import schema as compact_schema
+        response["result"] = compact_schema.compact(dependencies)
+        separators = (",", ":")
+    if keep_going:
+        response["errors"] = errors
+    if exceeded is not None:
+        response["error"] = repr(exceeded)
+        response["error_class"] = exceeded.__class__.__name__
+
+    return json.dumps(response, separators=separators)
+
 
-def parse_pep621_pep735_dependencies(pyproject_path):
-    with open(pyproject_path, "rb") as file:
-        project_toml = tomli.load(file)
+def parse_pep621_pep735_dependencies(pyproject_path, emit=None, schema=1,
+                                     files=None, keep_going=False,
+                                     deadline=None, cache=None,
+                                     ecosystem="python"):
+    if ecosystem not in ECOSYSTEMS:
+        raise ValueError(f"Unknown ecosystem: {ecosystem}")
+
+    errors = [] if keep_going else None
+    return collect(
+        pep621_pep735_records(
+            pyproject_path, files, errors, deadline, cache, ecosystem
+        ),
+        emit,
+        schema,
+        errors,
+    )
+
+
+def pep621_pep735_records(pyproject_path, files=None, errors=None,
+                          deadline=None, cache=None, ecosystem="python"):
+    budget.check(deadline)
+    directory = os.path.dirname(pyproject_path)
+    if cache is not None:
+        key, cached = cache.lookup(
+            f"parse_pep621_pep735_dependencies[{ecosystem}]",
+            vfs.Files(directory, files),
+            directory,
+            pyproject_path,
+            name=pyproject_path,
+        )
+        if cached is not None:
+            yield from cached["records"]
+            return
+        yield from cache.storing(
+            key,
+            pep621_pep735_records(
+                pyproject_path, files, errors, deadline, ecosystem=ecosystem
+            ),
+            vfs.Files(directory, files),
+            directory,
+            errors,
+        )
+        return
+
+    files = vfs.Files(directory, files)
+    with files.open(pyproject_path, "rb") as file:
+        content = file.read().decode()
+
+    try:
+        with spans.span("tomli.loads", file=pyproject_path):
+            project_toml = tomli.loads(content)
+    except tomli.TOMLDecodeError as e:
+        if errors is None:
+            raise
+        errors.append(
+            ParserError(e, pyproject_path, getattr(e, "lineno", None))
+        )
+        return
+
+    labels = ECOSYSTEMS[ecosystem]
+
+    def line_of(entry):
+        # tomli doesn't keep positions, so look for the first line with the
+        # entry as a quoted string
+        for number, line in enumerate(content.splitlines(), 1):
+            if f'"{entry}"' in line or f"'{entry}'" in line:
+                return number
 
     def version_from_req(specifier_set):
         if (len(specifier_set) == 1 and
@@ -60,8 +245,9 @@ def parse_pep621_pep735_dependencies(pyproject_path):
         try:
             req = Requirement(entry)
         except InvalidRequirement as e:
-            print(json.dumps({"error": repr(e)}))
-            exit(1)
+            if errors is None:
+                raise ParserError(e)
+            errors.append(ParserError(e, pyproject_path, line_of(entry)))
         else:
             data = {
                 "name": req.name,
@@ -74,20 +260,15 @@ def parse_pep621_pep735_dependencies(pyproject_path):
                 "extras": sorted(list(req.extras)),
                 "requirement_type": requirement_type,
             }
-            return data
+            yield data
 
     def parse_toml_section_pep621_dependencies(
         pyproject_path, dependencies, requirement_type=None
     ):
-        requirement_packages = []
-
         for dependency in dependencies:
-            parsed_dependency = parse_requirement(
+            yield from parse_requirement(
                 dependency, pyproject_path, requirement_type
             )
-            requirement_packages.append(parsed_dependency)
-
-        return requirement_packages
 
     def parse_toml_section_pep735_dependencies(
         pyproject_path,
@@ -95,37 +276,29 @@ def parse_pep621_pep735_dependencies(pyproject_path):
         group_name,
         visited=None,
     ):
-        requirement_packages = []
         visited = visited or set()
 
         if group_name in visited:
-            return requirement_packages
+            return
 
         visited.add(group_name)
         dependencies = dependency_groups.get(group_name, [])
         for entry in dependencies:
             # Handle direct requirement
             if isinstance(entry, str):
-                parsed_dependency = parse_requirement(
+                yield from parse_requirement(
                     entry, pyproject_path, group_name
                 )
-                requirement_packages.append(parsed_dependency)
             # Handle include-group directive
             elif isinstance(entry, dict) and "include-group" in entry:
                 included_group = entry["include-group"]
-                requirement_packages.extend(
-                    parse_toml_section_pep735_dependencies(
-                        pyproject_path,
-                        dependency_groups,
-                        included_group,
-                        visited
-                    )
+                yield from parse_toml_section_pep735_dependencies(
+                    pyproject_path,
+                    dependency_groups,
+                    included_group,
+                    visited
                 )
 
-        return requirement_packages
-
-    dependencies = []
-
     if 'project' in project_toml:
         project_section = project_toml['project']
 
@@ -134,9 +307,9 @@ def parse_pep621_pep735_dependencies(pyproject_path):
             runtime_dependencies = parse_toml_section_pep621_dependencies(
                 pyproject_path,
                 dependencies_toml,
-                "dependencies"
+                labels["dependencies"]
             )
-            dependencies.extend(runtime_dependencies)
+            yield from runtime_dependencies
 
         if 'optional-dependencies' in project_section:
             optional_dependencies_toml = project_section[
@@ -146,9 +319,9 @@ def parse_pep621_pep735_dependencies(pyproject_path):
                 group_dependencies = parse_toml_section_pep621_dependencies(
                     pyproject_path,
                     optional_dependencies_toml[group],
-                    group
+                    group if labels["optional"] else None
                 )
-                dependencies.extend(group_dependencies)
+                yield from group_dependencies
 
     if 'dependency-groups' in project_toml:
         dependency_groups = project_toml['dependency-groups']
@@ -156,7 +329,7 @@ def parse_pep621_pep735_dependencies(pyproject_path):
             group_dependencies = parse_toml_section_pep735_dependencies(
                 pyproject_path, dependency_groups, group_name
             )
-            dependencies.extend(group_dependencies)
+            yield from group_dependencies
 
     if 'build-system' in project_toml:
         build_system_section = project_toml['build-system']
@@ -164,72 +337,861 @@ def parse_pep621_pep735_dependencies(pyproject_path):
             build_system_dependencies = parse_toml_section_pep621_dependencies(
                 pyproject_path,
                 build_system_section['requires'],
-                "build-system.requires"
+                labels["build_system"]
             )
-            dependencies.extend(build_system_dependencies)
+            yield from build_system_dependencies
+
+    uv_sources = project_toml.get('tool', {}).get('uv', {}).get('sources')
+    if labels["uv_sources"] and uv_sources:
+        for dep_name, source_config in uv_sources.items():
+            if isinstance(source_config, dict) and 'path' in source_config:
+                # Add path dependency info
+                # but don't parse as regular dependency
+                yield {
+                    "name": dep_name,
+                    "version": None,
+                    "markers": None,
+                    "file": pyproject_path,
+                    "requirement": None,
+                    "extras": [],
+                    "path_dependency": True,
+                    "path": source_config['path']
+                }
+
+
+def parse_requirements(directory, emit=None, schema=1, files=None,
+                       keep_going=False, deadline=None, cache=None,
+                       max_depth=discovery.MAX_DEPTH, ignore=(),
+                       prefilter=True, offline=False, workers=None,
+                       fast_path=True, source_spans=False, hashes=False):
+    errors = [] if keep_going else None
+    skipped = [] if prefilter else None
+    includes = {}
+    unresolved = []
+    index_options = {}
+    return collect(
+        requirements_records(
+            directory, files, errors, deadline, cache, max_depth, ignore,
+            skipped, includes, unresolved, offline, workers, fast_path,
+            source_spans, hashes, index_options,
+            # Records that are streamed aren't held on to, so neither are
+            # the outcomes of large files
+            None if emit is None else MAX_REPLAYED,
+        ),
+        emit,
+        schema,
+        errors,
+        {
+            "skipped": skipped,
+            "includes": includes,
+            "unresolved": unresolved,
+            "index_options": index_options,
+        },
+    )
+
+
+def requirements_records(directory, files=None, errors=None, deadline=None,
+                         cache=None, max_depth=discovery.MAX_DEPTH, ignore=(),
+                         skipped=None, includes=None, unresolved=None,
+                         offline=False, workers=None, fast_path=True,
+                         source_spans=False, hashes=False,
+                         index_options=None, max_replayed=None):
+    """Yield the records of the requirement files under `directory`.
+
+    Files skipped by the prefilter are added to `skipped` when it's a list.
+    `workers` parses the files in a pool of that many processes, or as many
+    as there are CPUs for `True`, see `parallel_records`. The rest of the
+    arguments are `requirement_files_records`'s.
+    """
+    files = vfs.Files(directory, files)
+
+    # Parse the requirements.txt and pip-compile's requirements.in files
+    with spans.span("discover requirement files"):
+        paths = []
+        for path in discovery.requirement_files(
+            files, directory, max_depth, ignore
+        ):
+            reason = None
+            if skipped is not None:
+                reason = discovery.sniff(files, path)
+            if reason is None:
+                paths.append(path)
+            else:
+                skipped.append({
+                    "file": os.path.relpath(path, directory),
+                    "reason": reason,
+                })
+
+    arguments = (
+        directory, files, paths, errors, deadline, cache, includes,
+        unresolved, offline, fast_path, source_spans, hashes, index_options,
+    )
+    workers = worker_count(workers, len(paths))
+    if workers > 1:
+        yield from parallel_records(*arguments, workers)
+    else:
+        yield from requirement_files_records(*arguments, max_replayed)
+
+
+def worker_count(workers, files):
+    """How many processes to parse that many requirement files with."""
+    if not workers:
+        return 1
+    if workers is True:
+        try:
+            workers = len(os.sched_getaffinity(0))
+        except AttributeError:
+            workers = os.cpu_count() or 1
+    return max(1, min(int(workers), files))
+
+
+def parallel_records(directory, files, paths, errors=None, deadline=None,
+                     cache=None, includes=None, unresolved=None,
+                     offline=False, fast_path=True, source_spans=False,
+                     hashes=False, index_options=None, workers=1):
+    """Like `requirement_files_records`, in a pool of `workers` processes.
+
+    The files are split into contiguous chunks, several per worker, and the
+    results of the chunks are merged in order, so the output is the same as
+    parsing the files one after the other. A worker still parses each file
+    once, but a file included by files in different chunks is parsed once
+    per chunk.
+    """
+    import concurrent.futures
+
+    includes = {} if includes is None else includes
+    unresolved = [] if unresolved is None else unresolved
+    index_options = {} if index_options is None else index_options
+    size = -(-len(paths) // (workers * CHUNKS_PER_WORKER))
+    cache_settings = None
+    if cache is not None:
+        cache_settings = (cache.directory, cache.max_bytes)
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(
+                parse_requirement_files,
+                directory,
+                files.contents,
+                paths[start:start + size],
+                errors is not None,
+                deadline,
+                cache_settings,
+                offline,
+                fast_path,
+                source_spans,
+                hashes,
+            )
+            for start in range(0, len(paths), size)
+        ]
+        try:
+            for future in futures:
+                with spans.span("wait for requirement files"):
+                    result = future.result()
+                yield from result["records"]
+                if errors is not None:
+                    errors.extend(result["errors"])
+                merge_includes(includes, result["includes"])
+                index_options.update(result["index_options"])
+                unresolved.extend(
+                    u for u in result["unresolved"] if u not in unresolved
+                )
+                if cache is not None:
+                    cache.absorb(result["cache"])
+                if result["raised"] is not None:
+                    raise result["raised"]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+# How many chunks of files `parallel_records` gives each worker, so that a
+# worker that gets the slow files doesn't hold up the others for long
+CHUNKS_PER_WORKER = 4
+
+
+def parse_requirement_files(directory, contents, paths, keep_going, deadline,
+                            cache_settings, offline, fast_path,
+                            source_spans, hashes):
+    """Parse a chunk of `parallel_records`'s files in a worker process."""
+    from lib import cache as results
+
+    errors = [] if keep_going else None
+    includes = {}
+    unresolved = []
+    index_options = {}
+    records = []
+    raised = None
+    cache = None
+    with contextlib.ExitStack() as stack:
+        if cache_settings is not None:
+            cache = stack.enter_context(results.opened(*cache_settings))
+        try:
+            records.extend(requirement_files_records(
+                directory,
+                vfs.Files(directory, contents),
+                paths,
+                errors,
+                deadline,
+                cache,
+                includes,
+                unresolved,
+                offline,
+                fast_path,
+                source_spans,
+                hashes,
+                index_options,
+            ))
+        except (ParserError, budget.DeadlineExceeded) as e:
+            raised = e
+
+    return {
+        "records": records,
+        "errors": errors,
+        "includes": includes,
+        "unresolved": unresolved,
+        "index_options": index_options,
+        "raised": raised,
+        "cache": cache and cache.counts,
+    }
+
+
+def merge_includes(includes, other):
+    for name, edges in other.items():
+        known = includes.setdefault(name, [])
+        known.extend(edge for edge in edges if edge not in known)
+
+
+def byte_length(text):
+    return len(text) if text.isascii() else len(text.encode())
+
+
+def logical_lines(lines, offset=0):
+    """Group the lines of a requirements file into logical lines.
+
+    `lines` are the file's lines with their line breaks, split as
+    `str.splitlines` splits them. Lines ending in a backslash are joined
+    with the next ones, as pip's `join_lines` joins them. Yields the number
+    of each logical line's first line, and a list of its lines, each the
+    text without the line break, the UTF-8 byte offsets of its first
+    non-whitespace character and of its end, and the line break.
+
+    `offset` is where the lines start in the file, after any byte order
+    mark.
+    """
+    group = []
+    number = 0
+    for number, line in enumerate(lines, 1):
+        text = line.splitlines()[0]
+        indent = len(text) - len(text.lstrip())
+        group.append((
+            text,
+            offset + byte_length(text[:indent]),
+            offset + byte_length(text),
+            line[len(text):],
+        ))
+        offset += byte_length(line)
+        if not text.endswith("\\") or COMMENT_RE.match(text):
+            yield number - len(group) + 1, group
+            group = []
+    if group:
+        yield number - len(group) + 1, group
+
+
+HASH_RE = re.compile(
+    r"--hash(?:=|\s+)(?P<algorithm>[^:\s]+):(?P<value>[^\s\\]+)"
+)
+
+
+def line_source(first, group):
+    """Where a logical line of a requirements file is, and its hashes.
+
+    A requirement's logical line covers its `--hash` continuation lines.
+    `span` has the first and last line numbers, and the UTF-8 byte offsets
+    from the line's first non-whitespace character to the end of its last
+    line, not counting the line break:
+
+        {"lines": [3, 5], "bytes": [40, 211]}
+
+    `hashes` are the line's `--hash` options in order, and `hash_separator`
+    the text between the first two, or before the only one, like
+    `" \\\n    "` for pip-compile's, with the file's own line breaks.
+    Comments are left out.
+    """
+    options = "".join(
+        COMMENT_RE.sub("", text) + line_break
+        for text, _, _, line_break in group
+    )
+    matches = list(HASH_RE.finditer(options))
+    separator = None
+    if len(matches) > 1:
+        separator = options[matches[0].end():matches[1].start()]
+    elif matches:
+        before = options[:matches[0].start()]
+        separator = before[len(before.rstrip(" \t\r\n\\")):]
+    return {
+        "span": {
+            "lines": [first, first + len(group) - 1],
+            "bytes": [group[0][1], group[-1][2]],
+        },
+        "hashes": [
+            {"algorithm": m.group("algorithm"), "value": m.group("value")}
+            for m in matches
+        ],
+        "hash_separator": separator,
+    }
+
+
+# The byte order marks and coding comments pip's `get_file_content` decodes
+# requirement files by. UTF-32 goes first, as UTF-16's BOMs are prefixes of
+# its BOMs.
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF32, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF16, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+]
+ENCODING_RE = re.compile(rb"coding[:=]\s*([-\w.]+)")
+
+
+def decodes(f, offset, encoding):
+    """Whether a file decodes from `offset`, read a block at a time."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    f.seek(offset)
+    try:
+        for block in iter(lambda: f.read(io.DEFAULT_BUFFER_SIZE), b""):
+            decoder.decode(block)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def file_lines(files, path, constraint=False):
+    """The offset of a local requirements file's text, and its lines.
+
+    The file is decoded as pip's `get_file_content` decodes it, but read a
+    block at a time rather than all at once, so parsing a large file doesn't
+    hold all of it in memory. The offset is where the text starts in the
+    file, after any byte order mark, and the lines are yielded with their
+    line breaks.
+    """
+    import locale
+
+    from pip._internal.exceptions import InstallationError
+
+    try:
+        f = files.open(path, "rb")
+    except OSError as exc:
+        kind = "constraint" if constraint else "requirements"
+        raise InstallationError(f"Could not open {kind} file: {exc}")
 
-    return json.dumps({"result": dependencies})
+    if files.in_memory:
+        # Files sent with the request are text already
+        f.close()
+        return 0, split_lines(files.open(path))
 
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(f)
+        head = f.read(max(len(bom) for bom, _ in BOMS))
+        offset, encoding = next(
+            ((len(bom), encoding) for bom, encoding in BOMS
+             if head.startswith(bom)),
+            (0, None),
+        )
+        f.seek(0)
+        if encoding is None:
+            for line in (f.readline(), f.readline()):
+                match = ENCODING_RE.search(line.rstrip(b"\n"))
+                if line[0:1] == b"#" and match:
+                    encoding = match.group(1).decode("ascii")
+                    break
+
+        # pip decodes the file before parsing any of it, so make sure it
+        # decodes before returning any lines, raising pip's error if not
+        if encoding is None:
+            encoding = "utf-8"
+            if not decodes(f, offset, encoding):
+                encoding = locale.getpreferredencoding(False) or \
+                    sys.getdefaultencoding()
+        if not decodes(f, offset, encoding):
+            f.seek(offset)
+            f.read().decode(encoding)
+
+        f.seek(offset)
+        stack.pop_all()
+    return offset, split_lines(
+        io.TextIOWrapper(f, encoding=encoding, newline="\n")
+    )
+
+
+def split_lines(f):
+    """Yield the lines of a text file as `str.splitlines` splits them."""
+    with f:
+        for line in f:
+            yield from line.splitlines(keepends=True)
+
+
+# How many outcomes of a file `requirement_files_records` keeps to replay for
+# the other files that include it when the records are streamed, so that
+# memory doesn't grow with the size of the files
+MAX_REPLAYED = 1000
+
+
+def requirement_files_records(directory, files, paths, errors=None,
+                              deadline=None, cache=None, includes=None,
+                              unresolved=None, offline=False,
+                              fast_path=True, source_spans=False,
+                              hashes=False, index_options=None,
+                              max_replayed=None):
+    """Yield the records of the requirement files at `paths`, in order.
+
+    The `-r` and `-c` includes of each file are added to `includes`, which
+    maps the files to lists of `{"file", "constraint"}` edges. Remote
+    includes are fetched with a `PipSession`, which is only set up for the
+    first one. `offline` never sets one up, and adds each remote include to
+    `unresolved` instead of fetching it.
+
+    Requirements that `lib.tokenizer` can read are read without pip, unless
+    `fast_path` is false or the tokenizer's `packaging` doesn't match pip's.
+    `source_spans` adds where each requirement is in its file to its record,
+    and `hashes` its `--hash` options, see `line_sources`.
+
+    The `--index-url`, `--extra-index-url` and `--find-links` options of
+    each file are added to `index_options`, by file.
+
+    Files with more than `max_replayed` outcomes are parsed again for each
+    file that includes them rather than kept, see `outcomes`.
+    """
+    # setuptools has to replace distutils before pip gets to import it
+    import setuptools  # noqa: F401
+    import pip._internal.req.req_file
+    from pip._internal.exceptions import RequirementsFileParseError
+    from pip._internal.req.constructors import (
+        install_req_from_parsed_requirement,
+    )
 
-def parse_requirements(directory):
-    # Parse the requirements.txt
-    requirement_packages = []
-    requirement_files = glob.glob(os.path.join(directory, '*.txt')) \
-        + glob.glob(os.path.join(directory, '**', '*.txt'))
+    if fast_path:
+        from lib import tokenizer
+        fast_path = tokenizer.MATCHES_PIP
 
-    pip_compile_files = glob.glob(os.path.join(directory, '*.in')) \
-        + glob.glob(os.path.join(directory, '**', '*.in'))
+    includes = {} if includes is None else includes
+    unresolved = [] if unresolved is None else unresolved
+    index_options = {} if index_options is None else index_options
+
+    req_file = pip._internal.req.req_file
+
+    # The contents of the remote files fetched so far, which a file that's
+    # parsed as both requirements and constraints is read from the second
+    # time. Local files are read again rather than kept.
+    contents = {}
+
+    session = None
+
+    def remote_session():
+        nonlocal session
+        if session is None:
+            from pip._internal.network.session import PipSession
+            session = PipSession()
+        # Remote includes get the time that's left
+        session.timeout = budget.remaining(deadline)
+        return session
+
+    def read_lines(filename, constraint):
+        """The offset of a file's text and its lines, see `file_lines`."""
+        if not req_file.SCHEME_RE.search(filename):
+            return file_lines(files, filename, constraint)
+        # Remote -r and -c includes are still fetched by pip
+        if filename not in contents:
+            _, contents[filename] = req_file.get_file_content(
+                filename, remote_session()
+            )
+        return 0, iter(contents[filename].splitlines(keepends=True))
 
     def version_from_install_req(install_req):
         if install_req.is_pinned:
             return next(iter(install_req.specifier)).version
 
-    for reqs_file in requirement_files + pip_compile_files:
+    pattern = r"-[cr] (.*) \(line (\d+)\)"
+
+    def record_from(parsed_req):
+        """The record for a requirement, a `ParserError`, or None."""
         try:
-            requirements = pip._internal.req.req_file.parse_requirements(
-                reqs_file,
-                session=PipSession()
-            )
-            for parsed_req in requirements:
+            with spans.span("install_req_from_parsed_requirement"):
                 install_req = install_req_from_parsed_requirement(parsed_req)
-                if install_req.req is None:
-                    continue
+        except Exception as e:
+            if errors is None:
+                raise
+            # Keep going with the next line of the file
+            abs_path, line = re.search(pattern, parsed_req.comes_from).groups()
+            return ParserError(
+                e, os.path.relpath(abs_path, directory), int(line)
+            )
+
+        if install_req.req is None:
+            return None
 
-                # Ignore file: requirements
-                if install_req.link is not None and install_req.link.is_file:
+        # Ignore file: requirements
+        if install_req.link is not None and install_req.link.is_file:
+            return None
+
+        abs_path, line = re.search(pattern, install_req.comes_from).groups()
+
+        # Ignore dependencies from remote constraint files
+        if not files.isfile(abs_path):
+            return None
+
+        return with_source({
+            "name": install_req.req.name,
+            "version": version_from_install_req(install_req),
+            "markers": str(install_req.markers) or None,
+            "file": os.path.relpath(abs_path, directory),
+            "requirement": str(install_req.specifier) or None,
+            "extras": sorted(list(install_req.extras))
+        }, abs_path, int(line))
+
+    # The logical line each file being parsed is at, by file, with its
+    # number, see `line_source`
+    current_lines = {}
+
+    def with_source(record, filename, line_number):
+        if not (source_spans or hashes):
+            return record
+        first, group = current_lines[filename]
+        assert first == line_number
+        source = line_source(first, group)
+        if source_spans:
+            record["span"] = source["span"]
+        if hashes:
+            record["hashes"] = source["hashes"]
+            record["hash_separator"] = source["hash_separator"]
+        return record
+
+    parse_line = req_file.get_line_parser(None)
+
+    def parsed_lines(filename, constraint):
+        """The lines of a file, as pip's `RequirementsFileParser` has them.
+
+        Lines the tokenizer reads come out as their records instead. Like
+        pip's `preprocess`, but a logical line at a time.
+        """
+        offset, lines = read_lines(filename, constraint)
+        # Ignore dependencies from remote constraint files
+        local = files.isfile(filename)
+        for first, group in logical_lines(lines, offset):
+            current_lines[filename] = first, group
+            joined = req_file.expand_env_variables(req_file.ignore_comments(
+                req_file.join_lines(
+                    enumerate((text for text, _, _, _ in group), first)
+                )
+            ))
+            for line_number, line in joined:
+                fields = None
+                if fast_path:
+                    with spans.span("tokenize requirement line"):
+                        fields = tokenizer.record(line)
+                if fields is not None:
+                    if local:
+                        yield with_source({
+                            "name": fields["name"],
+                            "version": fields["version"],
+                            "markers": fields["markers"],
+                            "file": os.path.relpath(filename, directory),
+                            "requirement": fields["requirement"],
+                            "extras": fields["extras"],
+                        }, filename, line_number)
                     continue
 
-                pattern = r"-[cr] (.*) \(line \d+\)"
-                abs_path = re.search(pattern, install_req.comes_from).group(1)
+                try:
+                    args_str, opts = parse_line(line)
+                except req_file.OptionParsingError as e:
+                    raise RequirementsFileParseError(
+                        f"Invalid requirement: {line}\n{e.msg}"
+                    )
+                yield req_file.ParsedLine(
+                    filename, line_number, args_str, opts, constraint
+                )
+
+    # What parsing each file, with the files it includes, came to, by path
+    # and whether it's parsed as constraints: the records and `ParserError`s
+    # in order, ending with the exception that stopped it if there was one,
+    # which is raised again when they're replayed.
+    # A file included by many others is only parsed once, and its outcomes
+    # replayed for each of them, so the output is the same as pip parsing
+    # every file on its own. Files with more than `max_replayed` outcomes
+    # aren't kept, and are parsed again instead.
+    parsed_files = {}
+
+    def include_path(filename, req_path):
+        # As in pip's `RequirementsFileParser._parse_and_recurse`
+        if req_file.SCHEME_RE.search(filename):
+            return urllib.parse.urljoin(filename, req_path)
+        if not req_file.SCHEME_RE.search(req_path):
+            # Absolute, so that each file has one path to recognise it by
+            return os.path.abspath(
+                os.path.join(os.path.dirname(filename), req_path)
+            )
+        return req_path
+
+    def graph_name(path):
+        if req_file.SCHEME_RE.search(path):
+            return path
+        return os.path.relpath(path, directory)
+
+    def outcomes(filename, constraint=False, including=()):
+        parsed = parsed_files.get((filename, constraint))
+        if parsed is not None and parsed["outcomes"] is not None:
+            for outcome in parsed["outcomes"]:
+                if isinstance(outcome, ParserError) or \
+                        not isinstance(outcome, Exception):
+                    yield outcome
+                else:
+                    raise outcome
+            return
+
+        # The index options of a file parsed again are already known
+        reparsed = parsed is not None
+        parsed = parsed_files[(filename, constraint)] = {
+            "outcomes": [],
+            # The local files the outcomes depend on, with None for remote
+            # ones
+            "reads": [
+                None if req_file.SCHEME_RE.search(filename) else filename
+            ],
+        }
+
+        def add(outcome):
+            kept = parsed["outcomes"]
+            if kept is not None and (
+                max_replayed is None or len(kept) < max_replayed
+            ):
+                kept.append(outcome)
+            else:
+                parsed["outcomes"] = None
+            return outcome
 
-                # Ignore dependencies from remote constraint files
-                if not os.path.isfile(abs_path):
+        try:
+            lines = spans.steps(
+                "pip parse_requirements",
+                parsed_lines(filename, constraint),
+                file=filename,
+            )
+            for line in lines:
+                if isinstance(line, dict):
+                    yield add(line)
+                    continue
+                # `requirement` is None on other lines, or missing in pips
+                # before 24
+                requirement = getattr(line, "requirement", None)
+                if requirement is None and not reparsed:
+                    add_index_options(filename, line.opts)
+                if requirement is not None or not (
+                    line.opts.requirements or line.opts.constraints
+                ):
+                    parsed_req = req_file.handle_line(line, session=session)
+                    outcome = parsed_req and record_from(parsed_req)
+                    if outcome is not None:
+                        yield add(outcome)
                     continue
 
-                rel_path = os.path.relpath(abs_path, directory)
+                nested_constraint = not line.opts.requirements
+                nested = include_path(
+                    filename,
+                    (line.opts.constraints if nested_constraint
+                     else line.opts.requirements)[0],
+                )
+                edge = {
+                    "file": graph_name(nested),
+                    "constraint": nested_constraint,
+                }
+                edges = includes.setdefault(graph_name(filename), [])
+                if edge not in edges:
+                    edges.append(edge)
+                stack = including + (filename,)
+                if nested in stack:
+                    # Naming the file that first included it, as pip does
+                    index = stack.index(nested)
+                    tail = f" and again in {stack[index - 1]}" if index else ""
+                    raise RequirementsFileParseError(
+                        f"{nested} recursively references itself in "
+                        f"{filename}{tail}"
+                    )
+                if offline and req_file.SCHEME_RE.search(nested):
+                    include = {
+                        "file": graph_name(filename),
+                        "url": nested,
+                        "constraint": nested_constraint,
+                    }
+                    if include not in unresolved:
+                        unresolved.append(include)
+                    parsed["reads"].append(None)
+                    continue
 
-                requirement_packages.append({
-                    "name": install_req.req.name,
-                    "version": version_from_install_req(install_req),
-                    "markers": str(install_req.markers) or None,
-                    "file": rel_path,
-                    "requirement": str(install_req.specifier) or None,
-                    "extras": sorted(list(install_req.extras))
-                })
+                for outcome in outcomes(
+                    nested, nested_constraint, including + (filename,)
+                ):
+                    yield add(outcome)
+                parsed["reads"].extend(
+                    parsed_files[(nested, nested_constraint)]["reads"]
+                )
         except Exception as e:
-            print(json.dumps({"error": repr(e)}))
-            exit(1)
+            add(e)
+            raise
+
+    def add_index_options(filename, opts):
+        found = {
+            "index_url": opts.index_url,
+            "extra_index_urls": opts.extra_index_urls,
+            "find_links": opts.find_links,
+        }
+        if not any(found.values()):
+            return
+        known = index_options.setdefault(graph_name(filename), {})
+        if found["index_url"]:
+            known["index_url"] = found["index_url"]
+        for option in ("extra_index_urls", "find_links"):
+            known.setdefault(option, []).extend(found[option] or [])
+
+    def included_graph(filename):
+        """The part of the include graph that starts at `filename`."""
+        graph = {}
+        pending = [graph_name(filename)]
+        while pending:
+            name = pending.pop()
+            if name in graph or name not in includes:
+                continue
+            graph[name] = includes[name]
+            pending.extend(edge["file"] for edge in includes[name])
+        return graph
+
+    # Records with spans or hashes are cached apart from the ones without
+    cache_function = "parse_requirements"
+    extras = [
+        name for name, option in (("spans", source_spans), ("hashes", hashes))
+        if option
+    ]
+    if extras:
+        cache_function = f"parse_requirements[{','.join(extras)}]"
+
+    for reqs_file in paths:
+        budget.check(deadline)
+        if cache is not None:
+            key, cached = cache.lookup(
+                cache_function, files, directory, reqs_file
+            )
+            if cached is not None:
+                merge_includes(includes, cached.get("graph", {}))
+                index_options.update(cached.get("index_options", {}))
+                yield from cached["records"]
+                continue
+        parsed = []
+        failures = len(errors or ())
+        try:
+            for outcome in outcomes(reqs_file):
+                # Errors are only outcomes when keeping going
+                if isinstance(outcome, ParserError):
+                    errors.append(outcome)
+                    continue
+                # Only the records to cache are kept, so that streaming
+                # them doesn't hold on to them all
+                if cache is not None:
+                    parsed.append(outcome)
+                yield outcome
+
+            reads = parsed_files[(reqs_file, False)]["reads"]
+            if cache is not None and None not in reads and \
+                    len(errors or ()) == failures:
+                cache.store(
+                    key,
+                    parsed,
+                    files,
+                    directory,
+                    [path for path in reads if path != reqs_file],
+                    graph=included_graph(reqs_file),
+                    index_options={
+                        graph_name(path): index_options[graph_name(path)]
+                        for path in reads
+                        if graph_name(path) in index_options
+                    },
+                )
+        except Exception as e:
+            rel_path = os.path.relpath(reqs_file, directory)
+            if errors is None:
+                raise ParserError(e, rel_path)
+            # Keep going with the next file
+            errors.append(ParserError(e, rel_path))
+
+
+# The files the setup.py being run on each thread opens for reading, which
+# its cached records depend on. Audit hooks can't be removed, so a single
+# hook is added the first time a setup.py's reads are collected, and does
+# nothing while none are.
+setup_py_reads = threading.local()
+audit_hook = {"added": False, "collecting": 0}
+audit_hook_lock = threading.Lock()
+
+# The interpreter's own files, which aren't part of a project
+INTERPRETER_PATHS = tuple(
+    os.path.join(path, "")
+    for path in {
+        sys.prefix, sys.base_prefix, sys.exec_prefix,
+        *sysconfig.get_paths().values(),
+    }
+)
+
+
+def record_setup_py_read(event, args):
+    if not audit_hook["collecting"] or event != "open":
+        return
+    reads = getattr(setup_py_reads, "paths", None)
+    if reads is None:
+        return
+    path, mode, flags = args
+    if not isinstance(path, (str, bytes, os.PathLike)):
+        return
+    if mode is None:
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return
+    elif set("wax+") & set(mode):
+        return
+    reads.add(os.path.abspath(os.fsdecode(path)))
+
 
-    return json.dumps({"result": requirement_packages})
+def parse_setup(directory, emit=None, schema=1, files=None, keep_going=False,
+                deadline=None, cache=None):
+    errors = [] if keep_going else None
+    return collect(
+        setup_records(directory, files, errors, deadline, cache),
+        emit,
+        schema,
+        errors,
+    )
 
 
-def parse_setup(directory):
+def setup_records(directory, files=None, errors=None, deadline=None,
+                  cache=None):
+    import configparser
+    import setuptools
+    from pip._internal.req.constructors import install_req_from_line
+
     def version_from_install_req(install_req):
         if install_req.is_pinned:
             return next(iter(install_req.specifier)).version
 
     def parse_requirement(req, req_type, filename):
-        install_req = install_req_from_line(req)
+        try:
+            install_req = install_req_from_line(req)
+        except budget.DeadlineExceeded:
+            raise
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append(ParserError(e, filename))
+            return
+
         if install_req.original_link:
             return
 
@@ -257,8 +1219,22 @@ def parse_setup(directory):
     setup_cfg = "setup.cfg"
     setup_cfg_path = os.path.join(directory, setup_cfg)
     setup_packages = []
+    files = vfs.Files(directory, files)
+
+    setup_py_cached = None
+    if cache is not None and files.isfile(setup_py_path):
+        setup_py_key, setup_py_cached = cache.lookup(
+            "parse_setup", files, directory, setup_py_path
+        )
+    if setup_py_cached is not None:
+        yield from setup_py_cached["records"]
 
-    if os.path.isfile(setup_py_path):
+    if files.isfile(setup_py_path) and setup_py_cached is None:
+        failures = len(errors or ())
+        # Files that setup.py read, which its cached records depend on.
+        # Files sent with the request are only read through `fake_open`.
+        opened = []
+        collect_reads = cache is not None and not files.in_memory
 
         def setup(*args, **kwargs):
             for arg in ["setup_requires", "install_requires", "tests_require"]:
@@ -281,6 +1257,13 @@ def parse_setup(directory):
         global fake_open
 
         def fake_open(*args, **kwargs):
+            # Files sent with the request can be read, relative to setup.py
+            if files.in_memory and args and isinstance(args[0], str):
+                path = os.path.join(directory, args[0])
+                if files.isfile(path):
+                    opened.append(path)
+                    return files.open(path)
+
             content = (
                 "VERSION = ('0', '0', '1+dependabot')\n"
                 "__version__ = '0.0.1+dependabot'\n"
@@ -293,15 +1276,21 @@ def parse_setup(directory):
             )
             return io.StringIO(content)
 
-        content = open(setup_py_path, "r").read()
+        with files.open(setup_py_path) as f:
+            content = f.read()
 
         # Remove `print`, `open`, `log` and import statements
-        content = re.sub(r"print\s*\(", "noop(", content)
-        content = re.sub(r"log\s*(\.\w+)*\(", "noop(", content)
-        content = re.sub(r"\b(\w+\.)*(open|file)\s*\(", "fake_open(", content)
-        content = content.replace("parse_requirements(", "fake_parse(")
-        version_re = re.compile(r"^.*import.*__version__.*$", re.MULTILINE)
-        content = re.sub(version_re, "", content)
+        with spans.span("rewrite setup.py"):
+            content = re.sub(r"print\s*\(", "noop(", content)
+            content = re.sub(r"log\s*(\.\w+)*\(", "noop(", content)
+            content = re.sub(
+                r"\b(\w+\.)*(open|file)\s*\(", "fake_open(", content
+            )
+            content = content.replace("parse_requirements(", "fake_parse(")
+            version_re = re.compile(
+                r"^.*import.*__version__.*$", re.MULTILINE
+            )
+            content = re.sub(version_re, "", content)
 
         # Set variables likely to be imported
         __version__ = "0.0.1+dependabot"
@@ -315,13 +1304,72 @@ def parse_setup(directory):
         # Run as main (since setup.py is a script)
         __name__ = "__main__"
 
-        # Exec the setup.py
-        exec(content) in globals(), locals()
+        # Exec the setup.py, which may never return
+        if collect_reads:
+            with audit_hook_lock:
+                if not audit_hook["added"]:
+                    sys.addaudithook(record_setup_py_read)
+                    audit_hook["added"] = True
+                audit_hook["collecting"] += 1
+            setup_py_reads.paths = set()
+        try:
+            with budget.alarm(deadline), spans.span("exec setup.py"):
+                exec(content) in globals(), locals()
+        except budget.DeadlineExceeded:
+            # Pass on the requirements that setup() got before it ran out
+            yield from setup_packages
+            raise
+        except Exception as e:
+            if errors is None:
+                raise
+            # The substitutions above keep the line numbers of setup.py
+            lines = [
+                frame.lineno
+                for frame in traceback.extract_tb(e.__traceback__)
+                if frame.filename == "<string>"
+            ]
+            errors.append(
+                ParserError(e, setup_py, lines[-1] if lines else None)
+            )
+        finally:
+            if collect_reads:
+                reads = setup_py_reads.paths
+                setup_py_reads.paths = None
+                with audit_hook_lock:
+                    audit_hook["collecting"] -= 1
+
+        if collect_reads:
+            opened.extend(sorted(
+                path for path in reads
+                if files.isfile(path) and
+                not path.startswith(INTERPRETER_PATHS) and
+                not path.endswith(".pyc")
+            ))
+
+        if cache is not None and len(errors or ()) == failures:
+            cache.store(
+                setup_py_key, setup_packages, files, directory, opened
+            )
+
+        # The records come from setup() callbacks, so pass them on per file
+        yield from setup_packages
+        setup_packages.clear()
 
-    if os.path.isfile(setup_cfg_path):
+    setup_cfg_cached = None
+    if cache is not None and files.isfile(setup_cfg_path):
+        setup_cfg_key, setup_cfg_cached = cache.lookup(
+            "parse_setup", files, directory, setup_cfg_path
+        )
+    if setup_cfg_cached is not None:
+        setup_packages.extend(setup_cfg_cached["records"])
+
+    if files.isfile(setup_cfg_path) and setup_cfg_cached is None:
+        failures = len(errors or ())
+        budget.check(deadline)
         try:
             config = configparser.ConfigParser()
-            config.read(setup_cfg_path)
+            with files.open(setup_cfg_path) as f:
+                config.read_file(f)
 
             for req_type in [
                 "setup_requires",
@@ -346,7 +1394,15 @@ def parse_setup(directory):
                     )
 
         except Exception as e:
-            print(json.dumps({"error": repr(e)}))
-            exit(1)
+            if errors is None:
+                raise ParserError(e, setup_cfg)
+            errors.append(
+                ParserError(e, setup_cfg, getattr(e, "lineno", None))
+            )
+        else:
+            if cache is not None and len(errors or ()) == failures:
+                cache.store(
+                    setup_cfg_key, list(setup_packages), files, directory
+                )
 
-    return json.dumps({"result": setup_packages})
+    yield from setup_packages
@@ -0,0 +1,81 @@
+import importlib
+import json
+import os
+
+from lib import dispatcher
+
+# Imported once by the parent so that every forked child inherits them
+# copy-on-write. setuptools has to come before pip, see parser.py.
+PRELOAD = [
+    "setuptools",
+    "pip._internal.req.req_file",
+    "pip._internal.req.constructors",
+    "pip._internal.network.session",
+    "packaging.requirements",
+    "tomli",
+    "poetry.factory",
+    "lib.parser",
+    "lib.hasher",
+]
+
+
+def preload():
+    for module in PRELOAD:
+        importlib.import_module(module)
+
+
+def handle_in_child(request, write):
+    """Handle a request in a child forked from this (warm) process.
+
+    `parse_setup` patches setuptools and execs user code in its own globals,
+    so a request must never leave state behind for the next one. Running it
+    in a throwaway child guarantees that, and also survives a child that
+    crashes or calls `os._exit`.
+    """
+    # Checked here, as the parent reads the request's `id` after the fork
+    try:
+        dispatcher.check_request(request)
+    except ValueError as e:
+        response = dispatcher.error_response(e)
+        response["id"] = None
+        write(response)
+        return
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            with os.fdopen(write_fd, "w") as pipe:
+                def write_to_parent(line):
+                    pipe.write(json.dumps(line) + "\n")
+                    pipe.flush()
+
+                dispatcher.handle(request, write_to_parent)
+        except BaseException:
+            status = 1
+        finally:
+            # Skip atexit handlers and buffered stdio inherited from the parent
+            os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        for line in pipe:
+            write(json.loads(line))
+    _, status = os.waitpid(pid, 0)
+
+    # The child only exits cleanly once it has written its response
+    if status != 0:
+        write({
+            "id": request.get("id"),
+            "error": "Helper process exited with status "
+                     f"{os.waitstatus_to_exitcode(status)}",
+            "error_class": "HelperProcessFailed",
+        })
+
+
+def serve(stdin, stdout):
+    preload()
+    dispatcher.serve(stdin, stdout, handler=handle_in_child)
@@ -0,0 +1,75 @@
+"""Run helper calls under cProfile.
+
+A request with `"profile": true` is profiled, and its response gets a
+`profile` block with the path of the pstats dump and the functions that
+took the most cumulative time:
+
+    "profile": {
+      "path": "/tmp/parse_setup-4242-1.pstats",
+      "top": [{"function": "parser.py:412(setup_records)", "calls": 1,
+               "total_ms": 1.2, "cumulative_ms": 812.5}, ...]
+    }
+
+`"profile": "/some/path.pstats"` writes the dump to that path instead.
+Setting `DEPENDABOT_HELPER_PROFILE_DIR` profiles every call, with the dumps
+written to that directory, so that a helper can be profiled in the job that
+is slow without changing how it's called. Load a dump with
+`python -m pstats <path>` or a viewer like snakeviz.
+"""
+import contextlib
+import cProfile
+import itertools
+import os
+import pstats
+import tempfile
+
+ENVIRONMENT_VARIABLE = "DEPENDABOT_HELPER_PROFILE_DIR"
+
+TOP = 20
+
+counter = itertools.count(1)
+
+
+def dump_path(function, option):
+    """Where to write the dump for a call, or None to not profile it."""
+    if isinstance(option, str):
+        return option
+
+    directory = os.environ.get(ENVIRONMENT_VARIABLE)
+    if not option and not directory:
+        return None
+
+    name = f"{function}-{os.getpid()}-{next(counter)}.pstats"
+    return os.path.join(directory or tempfile.gettempdir(), name)
+
+
+def summary(profiler, top=TOP):
+    stats = pstats.Stats(profiler).stats
+    by_cumulative_time = sorted(
+        stats.items(), key=lambda item: item[1][3], reverse=True
+    )
+    return [
+        {
+            "function":
+                f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 1),
+            "cumulative_ms": round(cumulative * 1000, 1),
+        }
+        for (filename, line, name), (_, calls, total, cumulative, _)
+        in by_cumulative_time[:top]
+    ]
+
+
+@contextlib.contextmanager
+def profiled(path, top=TOP):
+    """Profile the block, filling in the yielded report when it exits."""
+    report = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        report.update({"path": path, "top": summary(profiler, top)})
@@ -0,0 +1,112 @@
+"""The compact (v2) output schema for parser results.
+
+Records from one file share most of their `file`, `markers`, `extras` and
+`requirement_type` values, which the default schema repeats in full for
+every record, along with every key. The v2 schema instead:
+
+* groups consecutive records from the same file,
+* interns the repeated strings in a single `strings` table, referring to
+  them by index,
+* writes each record as an array of its values in `fields` order, and
+* drops trailing values that are null or an empty list of extras.
+
+    {
+      "schema": 2,
+      "fields": ["name", "version", "markers", "file", ...],
+      "strings": ["requirements.txt", "sys_platform == \"win32\"", ...],
+      "files": [{"file": 0, "dependencies": [["pywin32", null, 1]]}]
+    }
+
+`fields` are the keys of the first record. Array values skip `file`, which
+comes from the group. A record with different keys is kept as an object,
+with its strings still interned.
+"""
+
+VERSION = 2
+
+INTERNED = {"file", "markers", "requirement_type"}
+
+
+def compact(records):
+    strings = []
+    indexes = {}
+    fields = None
+    files = []
+
+    def intern(value):
+        if value not in indexes:
+            indexes[value] = len(strings)
+            strings.append(value)
+        return indexes[value]
+
+    def encode(field, value):
+        if value is None:
+            return None
+        if field in INTERNED:
+            return intern(value)
+        if field == "extras":
+            return [intern(extra) for extra in value]
+        return value
+
+    for record in records:
+        keys = list(record)
+        if fields is None:
+            fields = keys
+
+        file = intern(record["file"])
+        if not files or files[-1]["file"] != file:
+            files.append({"file": file, "dependencies": []})
+
+        if keys == fields:
+            values = [
+                (key, encode(key, record[key])) for key in keys
+                if key != "file"
+            ]
+            # `expand` only fills in a dropped value as an empty list for
+            # `extras`, so other empty lists, like `hashes`, are kept
+            while values and (
+                values[-1][1] is None or values[-1] == ("extras", [])
+            ):
+                values.pop()
+            dependency = [value for _, value in values]
+        else:
+            dependency = {key: encode(key, value)
+                          for key, value in record.items()}
+        files[-1]["dependencies"].append(dependency)
+
+    return {
+        "schema": VERSION,
+        "fields": fields or [],
+        "strings": strings,
+        "files": files,
+    }
+
+
+def expand(result):
+    """Convert a v2 result back into the default schema's list of records."""
+    strings = result["strings"]
+    records = []
+
+    def decode(field, value):
+        if field == "extras":
+            return [strings[i] for i in value or []]
+        if field in INTERNED and value is not None:
+            return strings[value]
+        return value
+
+    for group in result["files"]:
+        for dependency in group["dependencies"]:
+            if isinstance(dependency, list):
+                values = iter(dependency)
+                dependency = {
+                    field: group["file"] if field == "file"
+                    else next(values, None)
+                    for field in result["fields"]
+                }
+
+            records.append({
+                field: decode(field, value)
+                for field, value in dependency.items()
+            })
+
+    return records
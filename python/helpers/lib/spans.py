@@ -0,0 +1,82 @@
+"""Timing spans for the helpers' slow phases, in the Chrome trace format.
+
+A request with a `trace` option records spans for the phases of its call
+and writes them to that path as trace-event JSON, which Perfetto or
+chrome://tracing can open:
+
+    {"function": "parse_setup", "args": ["/home/dependabot/project"],
+     "options": {"trace": "/tmp/parse_setup.trace.json"}}
+
+Spans are only recorded for the thread that made the call. Outside a
+recording `span` does nothing.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+recorder = threading.local()
+
+
+def now():
+    return time.perf_counter_ns() // 1000
+
+
+def add(name, start, args):
+    recorder.events.append({
+        "name": name,
+        "cat": "helper",
+        "ph": "X",
+        "ts": start,
+        "dur": now() - start,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    })
+
+
+@contextlib.contextmanager
+def recording(path):
+    """Record the spans in the block and write them to `path`."""
+    recorder.events = [{
+        "name": "process_name",
+        "ph": "M",
+        "pid": os.getpid(),
+        "args": {"name": "dependabot python helper"},
+    }]
+    try:
+        yield
+    finally:
+        events, recorder.events = recorder.events, None
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    if getattr(recorder, "events", None) is None:
+        yield
+        return
+
+    start = now()
+    try:
+        yield
+    finally:
+        add(name, start, args)
+
+
+def steps(name, iterable, **args):
+    """Record a span for each item that `iterable` takes to produce.
+
+    Use this for generators, so that the time spent by whatever consumes
+    the items isn't counted.
+    """
+    iterator = iter(iterable)
+    while True:
+        with span(name, **args):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,146 @@
+"""Tokenize the simple lines of requirement files without pip.
+
+Most lines of a requirements file, and nearly all of the lines pip-compile
+writes, are a name with optional extras, version specifiers, markers and
+`--hash` options:
+
+    requests[socks]==2.31.0 ; python_version >= "3.8" \\
+        --hash=sha256:58cd2187c01e70e6e26505bca751777aa9f2ee0b7f4300988b709f44e013003f
+
+pip builds an option parser and an `InstallRequirement` for every line,
+which is most of the time it takes to parse a large file. `record` gets the
+same name, version, specifiers, markers and extras for lines like these,
+following the steps pip's `parse_req_from_line` takes, and reading the
+requirement and markers with `packaging`. Anything else, like URLs, paths,
+editables, other options, or anything `record` isn't sure pip would read
+the same way, is left to pip by returning None, so that pip parses it or
+raises the error it always did.
+
+`packaging` formats requirements and markers the way the copy pip vendors
+does as long as they're the same major version, so the fast path is only
+taken when `MATCHES_PIP`.
+
+Lines have been through pip's `preprocess`, so continuation lines are
+already joined and comments are already stripped.
+"""
+import functools
+import re
+
+import packaging
+from packaging.markers import InvalidMarker, Marker
+from packaging.requirements import InvalidRequirement, Requirement
+# setuptools has to replace distutils before pip gets to import it
+import setuptools  # noqa: F401
+from pip._vendor import packaging as pip_packaging
+
+
+def major_version(version):
+    return version.split(".")[0]
+
+
+MATCHES_PIP = major_version(packaging.__version__) == \
+    major_version(pip_packaging.__version__)
+
+# The options pip-compile writes after a requirement, which are the only
+# options `record` reads
+HASH_OPTIONS_RE = re.compile(
+    r"(?:--hash(?:=|[ \t]+)(?:sha256|sha384|sha512):[^\s\"'\\]+[ \t]*)*"
+)
+
+# As in pip's `_strip_extras`
+TRAILING_EXTRAS_RE = re.compile(r"^(.+)(\[[^\]]+\])$")
+
+# The files pip installs a line as, rather than reading it as a requirement
+ARCHIVE_EXTENSIONS = (
+    ".zip", ".whl", ".tar.bz2", ".tbz", ".tar.gz", ".tgz", ".tar",
+    ".tar.xz", ".txz", ".tlz", ".tar.lz", ".tar.lzma",
+)
+
+
+def break_args_options(line):
+    """The requirement of a line and its options, as pip splits them."""
+    tokens = line.split(" ")
+    for index, token in enumerate(tokens):
+        if token.startswith("-"):
+            return " ".join(tokens[:index]), " ".join(tokens[index:])
+    return line, ""
+
+
+@functools.lru_cache(maxsize=512)
+def requirement(text):
+    """The name, specifier set and extras of a requirement, or None."""
+    try:
+        parsed = Requirement(text)
+    except InvalidRequirement:
+        return None
+    if parsed.url is not None or parsed.marker is not None:
+        return None
+
+    # pip takes trailing extras from the line itself, lowercased
+    extras = parsed.extras
+    trailing = TRAILING_EXTRAS_RE.match(text)
+    if trailing is not None:
+        try:
+            extras = Requirement(
+                "placeholder" + trailing.group(2).lower()
+            ).extras
+        except InvalidRequirement:
+            return None
+    return parsed.name, parsed.specifier, tuple(sorted(extras))
+
+
+@functools.lru_cache(maxsize=512)
+def markers(text):
+    """The markers as pip formats them, or None if they don't parse."""
+    try:
+        return str(Marker(text))
+    except InvalidMarker:
+        return None
+
+
+def record(line):
+    """The fields of the record for a line, or None to leave it to pip.
+
+    These are the fields pip would give the record, except for the file.
+    """
+    args, options = break_args_options(line)
+    if not args or HASH_OPTIONS_RE.fullmatch(options) is None:
+        return None
+
+    text, _, marker_text = args.partition(";")
+    text = text.strip()
+    marker_text = marker_text.strip()
+    # URLs, paths and direct references
+    if not text or any(character in text for character in "/\\@:("):
+        return None
+    path_no_extras = TRAILING_EXTRAS_RE.sub(r"\1", text)
+    if text.lower().endswith(ARCHIVE_EXTENSIONS) or \
+            path_no_extras.lower().endswith(ARCHIVE_EXTENSIONS):
+        return None
+
+    parsed = requirement(text)
+    if parsed is None:
+        return None
+    name, specifier, extras = parsed
+
+    # A requirement without markers has "None" for them, as pip has always
+    # formatted them
+    formatted_markers = "None"
+    if marker_text:
+        formatted_markers = markers(marker_text)
+        if formatted_markers is None:
+            return None
+
+    version = None
+    if len(specifier) == 1:
+        spec = next(iter(specifier))
+        if spec.operator in {"==", "==="}:
+            version = spec.version
+
+    return {
+        "name": name,
+        "version": version,
+        "markers": formatted_markers,
+        "requirement": str(specifier) or None,
+        "extras": list(extras),
+    }
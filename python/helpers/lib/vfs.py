@@ -0,0 +1,84 @@
+"""Read dependency files from the request instead of from disk.
+
+The helpers are called with a directory (or a pyproject.toml path) that the
+caller has written the dependency files to. A request can instead send the
+contents in a `files` option, mapping paths relative to that directory to
+their text:
+
+    {
+      "function": "parse_requirements",
+      "args": ["/home/dependabot/project"],
+      "options": {"files": {"requirements.txt": "requests==2.32.3\\n"}}
+    }
+
+The map is then the whole filesystem as far as the helper is concerned, and
+nothing is read from the directory.
+"""
+import errno
+import io
+import os.path
+
+
+class Files:
+    """The files under `root`, read from `contents` when it's given."""
+
+    def __init__(self, root, contents=None):
+        self.contents = None
+        if contents is not None:
+            self.contents = {
+                os.path.abspath(os.path.join(root, path)): content
+                for path, content in contents.items()
+            }
+
+    @property
+    def in_memory(self):
+        return self.contents is not None
+
+    def isfile(self, path):
+        if not self.in_memory:
+            return os.path.isfile(path)
+        return os.path.abspath(path) in self.contents
+
+    def open(self, path, *args):
+        if not self.in_memory:
+            return open(path, *args)
+        try:
+            content = self.contents[os.path.abspath(path)]
+        except KeyError:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), path
+            ) from None
+        if args and "b" in args[0]:
+            return io.BytesIO(content.encode())
+        return io.StringIO(content)
+
+    def walk(self, top):
+        """Walk the directories under `top` like `os.walk`.
+
+        As with `os.walk`, removing names from the yielded directory names
+        stops the walk from entering them.
+        """
+        if not self.in_memory:
+            yield from os.walk(top)
+            return
+
+        top = os.path.normpath(top)
+        tree = {}
+        for path in self.contents:
+            relative_path = os.path.relpath(path, top)
+            if relative_path.startswith(os.pardir + os.sep):
+                continue
+            *directories, name = relative_path.split(os.sep)
+            node = tree
+            for directory in directories:
+                node = node.setdefault(directory, {})
+            node[name] = None
+
+        def walk(path, node):
+            dirnames = [n for n, child in node.items() if child is not None]
+            filenames = [n for n, child in node.items() if child is None]
+            yield path, dirnames, filenames
+            for name in dirnames:
+                yield from walk(os.path.join(path, name), node[name])
+
+        yield from walk(top, tree)
@@ -1,22 +1,62 @@
+import argparse
 import sys
 import json
 
-from lib import parser, hasher
+from lib import dispatcher
+
+
+def emit(record):
+    print(json.dumps(record), flush=True)
+
 
 if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    mode = argparser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--serve",
+        action="store_true",
+        help="keep the interpreter, its imports and caches warm and answer "
+             "newline-delimited JSON requests from stdin",
+    )
+    mode.add_argument(
+        "--prefork",
+        action="store_true",
+        help="like --serve, but run each request in a child forked from a "
+             "parent that has already imported pip, setuptools and poetry",
+    )
+    mode.add_argument(
+        "--daemon",
+        metavar="SOCKET",
+        help="answer requests from many clients concurrently on a Unix "
+             "domain socket",
+    )
+    argparser.add_argument(
+        "--threads", type=int, help="daemon threads for network-bound calls"
+    )
+    argparser.add_argument(
+        "--processes", type=int, help="daemon processes for parsing calls"
+    )
+    options = argparser.parse_args()
+
+    if options.serve:
+        dispatcher.serve(sys.stdin, sys.stdout)
+        sys.exit(0)
+
+    if options.prefork:
+        from lib import prefork
+        prefork.serve(sys.stdin, sys.stdout)
+        sys.exit(0)
+
+    if options.daemon:
+        from lib import daemon
+        daemon.serve(options.daemon, options.threads, options.processes)
+        sys.exit(0)
+
     args = json.loads(sys.stdin.read())
 
-    # TODO Python 3.10 added native switch statements, so switch this if/elif
-    # to that once we drop support for 3.9.
-    if args["function"] == "parse_requirements":
-        print(parser.parse_requirements(args["args"][0]))
-    elif args["function"] == "parse_setup":
-        print(parser.parse_setup(args["args"][0]))
-    elif args["function"] == "parse_pep621_pep735_dependencies":
-        print(parser.parse_pep621_pep735_dependencies(args["args"][0]))
-    elif args["function"] == "get_dependency_hash":
-        print(hasher.get_dependency_hash(*args["args"]))
-    elif args["function"] == "get_pipfile_hash":
-        print(hasher.get_pipfile_hash(*args["args"]))
-    elif args["function"] == "get_pyproject_hash":
-        print(hasher.get_pyproject_hash(*args["args"]))
+    if args["function"] in dispatcher.FUNCTIONS:
+        print(dispatcher.invoke(
+            args["function"], args["args"], args.get("options"), emit
+        ))
+    elif args["function"] == "batch":
+        print(json.dumps(dispatcher.batch(args["args"])))
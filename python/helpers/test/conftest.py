@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules in lib/ import each other through the `lib` package, as run.py does
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import time
+from unittest.mock import patch
+from urllib.error import URLError
+
+import pytest
+
+from lib import budget, hasher, parser
+
+
+class TestAlarm:
+    def test_interrupts_the_block_at_the_deadline(self):
+        start = time.monotonic()
+
+        with pytest.raises(budget.DeadlineExceeded):
+            with budget.alarm(time.time() + 0.2):
+                while True:
+                    pass
+
+        assert time.monotonic() - start < 5
+
+    def test_leaves_the_block_alone_before_the_deadline(self):
+        with budget.alarm(time.time() + 60):
+            pass
+
+        time.sleep(0.01)
+
+
+class TestParsers:
+    def test_requirements_stop_between_files(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text("requests\n")
+
+        result = json.loads(parser.parse_requirements(
+            str(tmp_path), deadline=time.time() - 1
+        ))
+
+        assert result["result"] == []
+        assert result["error_class"] == "DeadlineExceeded"
+
+    def test_setup_py_is_interrupted_with_partial_results(self, tmp_path):
+        (tmp_path / "setup.py").write_text(
+            "from setuptools import setup\n"
+            "setup(install_requires=['requests'])\n"
+            "while True:\n"
+            "    pass\n"
+        )
+
+        result = json.loads(parser.parse_setup(
+            str(tmp_path), deadline=time.time() + 0.5
+        ))
+
+        assert [d["name"] for d in result["result"]] == ["requests"]
+        assert result["error_class"] == "DeadlineExceeded"
+
+    def test_streamed_trailer_reports_the_deadline(self, tmp_path):
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_text('[project]\ndependencies = ["requests"]\n')
+        records = []
+
+        trailer = json.loads(parser.parse_pep621_pep735_dependencies(
+            str(pyproject), emit=records.append, deadline=time.time() - 1
+        ))
+
+        assert records == []
+        [error] = trailer["errors"]
+        assert error["error_class"] == "DeadlineExceeded"
+
+
+class TestHasher:
+    @patch("hashin.get_package_hashes")
+    @patch("lib.hasher.get_package_data")
+    def test_fetches_the_package_data_for_hashin(self, mock_data, mock_get):
+        mock_data.return_value = {"releases": {}}
+        mock_get.return_value = {"hashes": [{"hash": "abc123"}]}
+
+        result = json.loads(hasher.get_dependency_hash(
+            "requests", "2.28.0", "sha256", deadline=time.time() + 60
+        ))
+
+        assert result == {"result": [{"hash": "abc123"}]}
+        assert mock_get.call_args.kwargs["lookup_memory"] == \
+            {"requests": {"releases": {}}}
+
+    @patch("lib.hasher.urlopen")
+    def test_reports_index_timeouts(self, mock_urlopen):
+        mock_urlopen.side_effect = URLError(TimeoutError("timed out"))
+
+        result = json.loads(hasher.get_dependency_hash(
+            "requests", "2.28.0", "sha256", deadline=time.time() + 60
+        ))
+
+        assert result["error_class"] == "DeadlineExceeded"
+        assert mock_urlopen.call_args.kwargs["timeout"] <= 60
+
+    @patch("lib.hasher.urlopen")
+    @patch("lib.hasher.get_package_data")
+    def test_reports_release_timeouts(self, mock_data, mock_urlopen):
+        mock_data.return_value = {"releases": {"2.28.0": [
+            {"url": "https://files.example/requests.whl", "digests": {}}
+        ]}}
+        mock_urlopen.side_effect = URLError(TimeoutError("timed out"))
+
+        result = json.loads(hasher.get_dependency_hash(
+            "requests", "2.28.0", "sha256", deadline=time.time() + 60
+        ))
+
+        assert result["error_class"] == "DeadlineExceeded"
+        assert mock_urlopen.call_args.args == \
+            ("https://files.example/requests.whl",)
+        assert mock_urlopen.call_args.kwargs["timeout"] <= 60
+
+    @patch("lib.hasher.urlopen")
+    @patch("lib.hasher.get_package_data")
+    def test_hashes_releases_without_digests(self, mock_data, mock_urlopen):
+        mock_data.return_value = {
+            "info": {"name": "requests"},
+            "releases": {"2.28.0": [
+                {"url": "https://files.example/requests.whl", "digests": {}},
+                {"url": "https://files.example/requests.tar.gz",
+                 "digests": {"sha256": "abc123"}},
+            ]},
+        }
+        mock_urlopen.return_value.__enter__.return_value.read.return_value = \
+            b"wheel"
+
+        result = json.loads(hasher.get_dependency_hash(
+            "requests", "2.28.0", "sha256", deadline=time.time() + 60
+        ))
+
+        assert sorted(r["hash"] for r in result["result"]) == \
+            sorted(["abc123", hashlib.sha256(b"wheel").hexdigest()])
+        mock_urlopen.assert_called_once()
+
+    def test_pipfile_hash_checks_the_deadline(self, tmp_path):
+        result = json.loads(hasher.get_pipfile_hash(
+            str(tmp_path), deadline=time.time() - 1
+        ))
+
+        assert result["error_class"] == "DeadlineExceeded"
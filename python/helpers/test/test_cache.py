@@ -0,0 +1,275 @@
+import os
+import shutil
+
+import pytest
+
+from lib import cache, dispatcher
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def project(tmp_path):
+    directory = tmp_path / "project"
+    shutil.copytree(os.path.join(FIXTURES, "requirements"), directory)
+    return directory
+
+
+def parse(function, path, option):
+    return dispatcher.call(function, [str(path)], {"cache": option})
+
+
+class TestCacheOption:
+    def test_reuses_the_records_of_unchanged_files(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+
+        first = parse("parse_requirements", project, option)
+        second = parse("parse_requirements", project, option)
+
+        assert second["result"] == first["result"]
+        assert first["cache"]["hits"] == 0
+        assert first["cache"]["misses"] == 5
+        assert second["cache"]["hits"] == 5
+        assert second["cache"]["misses"] == 0
+        assert second["cache"]["total"]["entries"] == 5
+        assert second["cache"]["total"]["hits"] == 5
+
+    def test_hits_for_the_same_contents_in_another_directory(
+        self, project, tmp_path
+    ):
+        option = str(tmp_path / "cache")
+        other = tmp_path / "other"
+        shutil.copytree(project, other)
+
+        first = parse("parse_requirements", project, option)
+        second = parse("parse_requirements", other, option)
+
+        assert second["cache"]["hits"] == 5
+        assert second["result"] == first["result"]
+
+    def test_misses_only_for_changed_files(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+        parse("parse_requirements", project, option)
+        (project / "markers.txt").write_text("flask==2.0.0\n")
+
+        response = parse("parse_requirements", project, option)
+
+        assert response["cache"]["hits"] == 4
+        assert response["cache"]["misses"] == 1
+        assert {"flask", "requests"} <= {
+            d["name"] for d in response["result"]
+        }
+
+    def test_misses_when_an_included_file_changes(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+        parse("parse_requirements", project, option)
+        (project / "constraints.txt").write_text("requests<2.20\n")
+
+        response = parse("parse_requirements", project, option)
+
+        assert response["cache"]["misses"] == 2
+        constraints = [
+            d["requirement"] for d in response["result"]
+            if d["file"] == "constraints.txt"
+        ]
+        assert constraints == ["<2.20", "<2.20"]
+
+    def test_keeps_the_include_graph(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+
+        first = parse("parse_requirements", project, option)
+        second = parse("parse_requirements", project, option)
+
+        assert second["cache"]["hits"] == 5
+        assert second["includes"] == first["includes"] == {
+            "with_constraints.txt": [
+                {"file": "constraints.txt", "constraint": True}
+            ],
+        }
+
+    def test_keeps_the_index_options(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+        (project / "constraints.txt").write_text(
+            "--index-url https://pypi.example.com/simple\nrequests<3.0\n"
+        )
+
+        first = parse("parse_requirements", project, option)
+        second = parse("parse_requirements", project, option)
+
+        assert second["cache"]["hits"] == 5
+        assert second["index_options"] == first["index_options"] == {
+            "constraints.txt": {
+                "index_url": "https://pypi.example.com/simple",
+                "extra_index_urls": [],
+                "find_links": [],
+            },
+        }
+
+    def test_counts_the_hits_of_worker_processes(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+        parse("parse_requirements", project, option)
+
+        response = dispatcher.call(
+            "parse_requirements",
+            [str(project)],
+            {"cache": option, "workers": 2},
+        )
+
+        assert response["cache"]["hits"] == 5
+        assert response["cache"]["total"]["hits"] == 5
+
+    def test_keeps_records_with_spans_apart(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+        parse("parse_requirements", project, option)
+
+        response = dispatcher.call(
+            "parse_requirements",
+            [str(project)],
+            {"cache": option, "source_spans": True},
+        )
+
+        assert response["cache"]["misses"] == 5
+        assert all("span" in d for d in response["result"])
+
+    def test_caches_setup_and_pyproject_files(self, tmp_path):
+        option = str(tmp_path / "cache")
+        setup = os.path.join(FIXTURES, "setup_py")
+        pyproject = os.path.join(FIXTURES, "pep621_dependencies.toml")
+
+        for _ in range(2):
+            setup_response = parse("parse_setup", setup, option)
+            pyproject_response = parse(
+                "parse_pep621_pep735_dependencies", pyproject, option
+            )
+
+        assert setup_response["cache"]["hits"] == 1
+        assert pyproject_response["cache"]["hits"] == 1
+        assert "requests" in {d["name"] for d in setup_response["result"]}
+
+    def test_misses_when_a_file_setup_py_read_changes(
+        self, tmp_path, monkeypatch
+    ):
+        option = str(tmp_path / "cache")
+        project = tmp_path / "project"
+        project.mkdir()
+        (project / "setup.py").write_text(
+            "from pathlib import Path\n"
+            "from setuptools import setup\n"
+            "setup(install_requires=Path('reqs.txt').read_text().split())\n"
+        )
+        (project / "reqs.txt").write_text("requests==1.0\n")
+        monkeypatch.chdir(project)
+
+        parse("parse_setup", project, option)
+        (project / "reqs.txt").write_text("requests==2.0\n")
+        response = parse("parse_setup", project, option)
+
+        assert response["cache"]["hits"] == 0
+        assert [d["requirement"] for d in response["result"]] == ["==2.0"]
+
+    def test_only_watches_setup_py_reads_when_caching(
+        self, tmp_path, monkeypatch
+    ):
+        import sys
+
+        from lib import parser
+
+        hooks = []
+        monkeypatch.setattr(sys, "addaudithook", hooks.append)
+        monkeypatch.setattr(
+            parser, "audit_hook", {"added": False, "collecting": 0}
+        )
+        setup_py = os.path.join(FIXTURES, "setup_py")
+
+        dispatcher.call("parse_setup", [setup_py])
+        assert hooks == []
+
+        parse("parse_setup", setup_py, str(tmp_path / "cache"))
+        assert hooks == [parser.record_setup_py_read]
+        assert parser.audit_hook == {"added": True, "collecting": 0}
+
+    def test_does_not_cache_files_that_failed(self, project, tmp_path):
+        option = str(tmp_path / "cache")
+        (project / "requirements.txt").write_text("requests=>2.0\n")
+
+        for _ in range(2):
+            response = dispatcher.call(
+                "parse_requirements",
+                [str(project)],
+                {"cache": option, "keep_going": True},
+            )
+
+        assert response["errors"]
+        assert response["cache"]["misses"] == 1
+        assert response["cache"]["hits"] == 4
+
+    def test_evicts_the_least_recently_used_entries(self, project, tmp_path):
+        option = {"path": str(tmp_path / "cache"), "max_bytes": 600}
+
+        first = parse("parse_requirements", project, option)
+        second = parse("parse_requirements", project, option)
+
+        assert first["cache"]["evictions"] > 0
+        assert first["cache"]["total"]["bytes"] <= 600
+        assert second["result"] == first["result"]
+
+    def test_keeps_running_totals_of_the_entries(self, tmp_path):
+        import sqlite3
+
+        from lib import vfs
+
+        files = vfs.Files(str(tmp_path))
+        path = tmp_path / "cache"
+
+        def totals():
+            connection = sqlite3.connect(path / "results.sqlite3")
+            counted = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            kept = dict(connection.execute(
+                "SELECT name, value FROM counters"
+            ).fetchall())
+            connection.close()
+            return counted, (kept["entries"], kept["bytes"])
+
+        with cache.opened(str(path), max_bytes=200) as results:
+            for key in ("a", "b", "a"):
+                results.store(key, [{"name": key * 20}], files, tmp_path)
+            results.store("c", [{"name": "c" * 120}], files, tmp_path)
+
+        counted, kept = totals()
+        assert kept == counted
+        assert counted[1] <= 200
+        assert results.report["total"]["entries"] == counted[0]
+
+        # A database from before the totals were kept gets them added up
+        connection = sqlite3.connect(path / "results.sqlite3")
+        connection.execute("DELETE FROM counters")
+        connection.commit()
+        connection.close()
+        with cache.opened(str(path)):
+            pass
+
+        counted, kept = totals()
+        assert kept == counted
+
+    def test_caches_every_call_with_the_environment_variable(
+        self, project, tmp_path, monkeypatch
+    ):
+        monkeypatch.setenv(cache.ENVIRONMENT_VARIABLE, str(tmp_path))
+
+        dispatcher.call("parse_requirements", [str(project)])
+        response = dispatcher.call("parse_requirements", [str(project)])
+
+        assert response["cache"]["hits"] == 5
+        assert os.path.exists(tmp_path / "results.sqlite3")
+
+    def test_leaves_the_response_alone_by_default(self, monkeypatch):
+        monkeypatch.delenv(cache.ENVIRONMENT_VARIABLE, raising=False)
+
+        response = dispatcher.call(
+            "parse_pep621_pep735_dependencies",
+            [os.path.join(FIXTURES, "pep621_dependencies.toml")],
+        )
+
+        assert "cache" not in response
@@ -0,0 +1,205 @@
+import json
+
+from lib import compiled
+
+HEADER = (
+    "#\n"
+    "# This file is autogenerated by pip-compile with Python 3.11\n"
+    "# by the following command:\n"
+    "#\n"
+    "#    pip-compile --output-file={output} {sources}\n"
+    "#\n"
+)
+
+
+def write(directory, files):
+    for name, content in files.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def parse(directory, dependency=None, **options):
+    return json.loads(
+        compiled.parse_pip_compile_graph(str(directory), dependency, **options)
+    )
+
+
+def compiled_file(output, sources, pins):
+    return HEADER.format(output=output, sources=sources) + pins
+
+
+class TestGraph:
+    def test_reads_the_via_notes(self, tmp_path):
+        write(tmp_path, {
+            "requirements.in": "requests\n",
+            "requirements.txt": compiled_file(
+                "requirements.txt",
+                "requirements.in",
+                "certifi==2024.2.2\n"
+                "    # via requests\n"
+                "Requests==2.31.0 \\\n"
+                "    --hash=sha256:" + "0" * 64 + "\n"
+                "    # via\n"
+                "    #   -r requirements.in\n"
+                "    #   my-project (setup.py)\n"
+                "urllib3==2.2.1           # via requests, Other_Package\n",
+            ),
+        })
+
+        assert parse(tmp_path)["result"] == {
+            "requirements.txt": {
+                "sources": ["requirements.in"],
+                "pins": {
+                    "certifi": {"version": "2024.2.2", "via": ["requests"]},
+                    "requests": {
+                        "version": "2.31.0",
+                        "via": ["-r requirements.in", "my-project"],
+                    },
+                    "urllib3": {
+                        "version": "2.2.1",
+                        "via": ["requests", "other-package"],
+                    },
+                },
+            },
+        }
+
+    def test_reads_the_sources_from_the_header(self, tmp_path):
+        write(tmp_path, {
+            "requirements/test.txt": compiled_file(
+                "requirements/test.txt",
+                "--resolver backtracking requirements/test.in extra.in",
+                "pytest==8.0.0\n    # via -r requirements/test.in\n",
+            ),
+        })
+
+        graph = parse(tmp_path)["result"]
+
+        assert graph["requirements/test.txt"]["sources"] == [
+            "requirements/test.in", "extra.in",
+        ]
+
+    def test_falls_back_to_the_in_file_of_the_same_name(self, tmp_path):
+        write(tmp_path, {
+            "dev.in": "pytest\n",
+            "dev.txt": "pytest==8.0.0\n    # via -r dev.in\n",
+        })
+
+        assert parse(tmp_path)["result"]["dev.txt"]["sources"] == ["dev.in"]
+
+    def test_skips_files_pip_compile_did_not_write(self, tmp_path):
+        write(tmp_path, {
+            "requirements.txt": "requests==2.31.0  # pinned for now\n",
+        })
+
+        assert parse(tmp_path)["result"] == {}
+
+
+class TestRecompile:
+    def write_project(self, directory):
+        write(directory, {
+            "requirements.in": "requests\nflask\n",
+            "requirements.txt": compiled_file(
+                "requirements.txt",
+                "requirements.in",
+                "certifi==2024.2.2\n    # via requests\n"
+                "flask==3.0.0\n    # via -r requirements.in\n"
+                "requests==2.31.0\n    # via -r requirements.in\n",
+            ),
+            "dev.in": "-c requirements.txt\npytest\nrequests\n",
+            "dev.txt": compiled_file(
+                "dev.txt",
+                "dev.in",
+                "certifi==2024.2.2\n"
+                "    # via\n"
+                "    #   -c requirements.txt\n"
+                "    #   requests\n"
+                "pytest==8.0.0\n    # via -r dev.in\n"
+                "requests==2.31.0\n"
+                "    # via\n"
+                "    #   -c requirements.txt\n"
+                "    #   -r dev.in\n",
+            ),
+            "docs.in": "-c requirements.txt\nflask\nsphinx\n",
+            "docs.txt": compiled_file(
+                "docs.txt",
+                "docs.in",
+                "flask==3.0.0\n"
+                "    # via\n"
+                "    #   -c requirements.txt\n"
+                "    #   -r docs.in\n"
+                "sphinx==7.2.6\n    # via -r docs.in\n",
+            ),
+            "lint.txt": compiled_file(
+                "lint.txt", "lint.in", "flake8==7.0.0\n    # via -r lint.in\n"
+            ),
+        })
+
+    def test_recompiles_only_the_files_that_pin_the_dependency(
+        self, tmp_path
+    ):
+        self.write_project(tmp_path)
+
+        assert parse(tmp_path, "sphinx")["recompile"] == [
+            {"file": "docs.txt", "sources": ["docs.in"]},
+        ]
+
+    def test_recompiles_files_constrained_by_a_changed_file_last(
+        self, tmp_path
+    ):
+        self.write_project(tmp_path)
+
+        # certifi is only pinned through requests, but changes with it
+        assert parse(tmp_path, "Certifi")["recompile"] == [
+            {"file": "requirements.txt", "sources": ["requirements.in"]},
+            {"file": "dev.txt", "sources": ["dev.in"]},
+        ]
+
+    def test_follows_pins_taken_from_a_file_that_changes(self, tmp_path):
+        write(tmp_path, {
+            "base.txt": compiled_file(
+                "base.txt", "base.in",
+                "idna==3.6\n    # via requests\n"
+                "requests==2.31.0\n    # via -r base.in\n",
+            ),
+            # idna isn't pinned here, but changes when base.txt's does
+            "test.txt": compiled_file(
+                "test.txt", "test.in",
+                "idna==3.6\n    # via -c base.txt\n"
+                "yarl==1.9.4\n    # via -r test.in\n",
+            ),
+            "lint.txt": compiled_file(
+                "lint.txt", "lint.in",
+                "yarl==1.9.4\n    # via -c test.txt\n",
+            ),
+        })
+
+        assert [
+            entry["file"] for entry in parse(tmp_path, "requests")["recompile"]
+        ] == ["base.txt", "test.txt"]
+
+    def test_recompiles_nothing_for_a_dependency_nothing_pins(
+        self, tmp_path
+    ):
+        self.write_project(tmp_path)
+
+        assert parse(tmp_path, "django")["recompile"] == []
+
+    def test_leaves_the_recompile_list_out_without_a_dependency(
+        self, tmp_path
+    ):
+        self.write_project(tmp_path)
+
+        assert "recompile" not in parse(tmp_path)
+
+    def test_reads_the_files_of_the_request(self, tmp_path):
+        response = parse(tmp_path, "requests", files={
+            "requirements.txt": compiled_file(
+                "requirements.txt", "requirements.in",
+                "requests==2.31.0\n    # via -r requirements.in\n",
+            ),
+        })
+
+        assert response["recompile"] == [
+            {"file": "requirements.txt", "sources": ["requirements.in"]},
+        ]
@@ -0,0 +1,143 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+
+HELPERS_DIR = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, HELPERS_DIR)
+
+from lib import daemon  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+RUN_PY = os.path.join(HELPERS_DIR, "run.py")
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    path = str(tmp_path / "helper.sock")
+    process = subprocess.Popen(
+        [sys.executable, RUN_PY, "--daemon", path, "--processes", "2"],
+        cwd=HELPERS_DIR,
+    )
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        assert process.poll() is None, "daemon exited during startup"
+        assert time.monotonic() < deadline, "daemon didn't start"
+        time.sleep(0.05)
+
+    yield path
+
+    process.terminate()
+    process.wait(timeout=30)
+    assert not os.path.exists(path)
+
+
+def send(path, requests):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(path)
+    client.sendall(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+    client.shutdown(socket.SHUT_WR)
+    stream = client.makefile()
+    responses = [json.loads(line) for line in stream]
+    client.close()
+    return {r["id"]: r for r in responses}
+
+
+class TestDaemon:
+    def test_answers_several_clients(self, socket_path):
+        setup_py = os.path.join(FIXTURES, "setup_py")
+        pyproject = os.path.join(FIXTURES, "pep621_dependencies.toml")
+        first = send(socket_path, [
+            {"id": 1, "function": "parse_setup", "args": [setup_py]},
+            {"id": 2, "function": "parse_setup", "args": [setup_py]},
+        ])
+        second = send(socket_path, [
+            {
+                "id": 3,
+                "function": "parse_pep621_pep735_dependencies",
+                "args": [pyproject],
+            },
+            {"id": 4, "function": "nope", "args": []},
+        ])
+
+        assert first[1]["result"] == first[2]["result"]
+        assert "requests" in {d["name"] for d in second[3]["result"]}
+        assert second[4]["error"] == "Unknown function: nope"
+
+    def test_only_lets_its_own_user_connect(self, socket_path):
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+    def test_answers_requests_that_are_not_objects(self, socket_path):
+        responses = send(socket_path, [
+            [1],
+            {"id": 2, "function": "nope", "args": []},
+        ])
+
+        assert responses[None]["error_class"] == "ValueError"
+        assert responses[2]["error"] == "Unknown function: nope"
+
+    def test_removes_the_socket_when_stopped_as_it_starts(self, tmp_path):
+        path = str(tmp_path / "helper.sock")
+        for _ in range(10):
+            process = subprocess.Popen(
+                [sys.executable, RUN_PY, "--daemon", path],
+                cwd=HELPERS_DIR,
+            )
+            deadline = time.monotonic() + 30
+            while not os.path.exists(path):
+                assert process.poll() is None, "daemon exited during startup"
+                assert time.monotonic() < deadline, "daemon didn't start"
+            process.terminate()
+
+            assert process.wait(timeout=30) == 0
+            assert not os.path.exists(path)
+
+
+class TestProcessPool:
+    def test_replaces_the_pool_when_a_worker_dies(self):
+        pool = daemon.ProcessPool(1)
+
+        async def calls():
+            with pytest.raises(concurrent.futures.process.BrokenProcessPool):
+                await pool.run(os._exit, 1)
+            return await pool.run(abs, -2)
+
+        try:
+            assert asyncio.run(calls()) == 2
+        finally:
+            pool.shutdown()
+
+
+class TestHandleNetworkBound:
+    @patch("hashin.get_package_hashes")
+    def test_returns_response_with_id(self, mock_get):
+        mock_get.return_value = {"hashes": [{"hash": "abc123"}]}
+
+        [response] = daemon.handle_network_bound({
+            "id": "h",
+            "function": "get_dependency_hash",
+            "args": ["requests", "2.28.0", "sha256"],
+        })
+
+        assert response == {"result": [{"hash": "abc123"}], "id": "h"}
+
+    @patch("hashin.get_package_hashes")
+    def test_reports_exceptions(self, mock_get):
+        mock_get.side_effect = ValueError("boom")
+
+        [response] = daemon.handle_network_bound({
+            "id": "h",
+            "function": "get_dependency_hash",
+            "args": ["requests", "2.28.0", "sha256"],
+        })
+
+        assert response["error_class"] == "ValueError"
+        assert response["id"] == "h"
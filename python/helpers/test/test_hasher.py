@@ -14,7 +14,7 @@ import hashin as hashin_mod  # noqa: E402
 
 
 class TestGetDependencyHash:
-    @patch("hasher.hashin.get_package_hashes")
+    @patch("hashin.get_package_hashes")
     def test_returns_hashes(self, mock_get):
         mock_get.return_value = {
             "hashes": [
@@ -32,7 +32,7 @@ class TestGetDependencyHash:
         assert result["result"][0]["hash"] == "abc123"
         mock_get.assert_called_once()
 
-    @patch("hasher.hashin.get_package_hashes")
+    @patch("hashin.get_package_hashes")
     def test_custom_index_url(self, mock_get):
         mock_get.return_value = {"hashes": []}
 
@@ -48,7 +48,7 @@ class TestGetDependencyHash:
             index_url="https://custom.registry/simple/"
         )
 
-    @patch("hasher.hashin.get_package_hashes")
+    @patch("hashin.get_package_hashes")
     def test_package_not_found(self, mock_get):
         mock_get.side_effect = hashin_mod.PackageNotFoundError(
             "no-such-package"
@@ -60,7 +60,7 @@ class TestGetDependencyHash:
 
         assert "error" in result
 
-    @patch("hasher.hashin.get_package_hashes")
+    @patch("hashin.get_package_hashes")
     def test_ssl_certificate_error(self, mock_get):
         ssl_error = ssl.SSLError(
             "CERTIFICATE_VERIFY_FAILED: unable to get local issuer"
@@ -74,7 +74,7 @@ class TestGetDependencyHash:
         assert "error" in result
         assert "CERTIFICATE_VERIFY_FAILED" in result["error"]
 
-    @patch("hasher.hashin.get_package_hashes")
+    @patch("hashin.get_package_hashes")
     def test_non_ssl_url_error_raises(self, mock_get):
         mock_get.side_effect = URLError("Connection refused")
 
@@ -87,20 +87,31 @@ class TestGetDependencyHash:
 
 class TestGetPipfileHash:
     @patch("builtins.open")
-    @patch("hasher.plette")
-    def test_returns_hash(self, mock_plette, mock_open):
+    @patch("plette.Pipfile")
+    def test_returns_hash(self, mock_pipfile_cls, mock_open):
         mock_pipfile = MagicMock()
         mock_pipfile.get_hash.return_value.value = "abc123hash"
-        mock_plette.Pipfile.load.return_value = mock_pipfile
+        mock_pipfile_cls.load.return_value = mock_pipfile
 
         result = json.loads(hasher.get_pipfile_hash("/tmp/project"))
 
         assert result["result"] == "abc123hash"
         mock_open.assert_called_once_with("/tmp/project/Pipfile")
 
+    def test_reads_the_pipfile_from_files(self, tmp_path):
+        content = '[packages]\nrequests = "*"\n'
+        (tmp_path / "Pipfile").write_text(content)
+        on_disk = json.loads(hasher.get_pipfile_hash(str(tmp_path)))
+
+        result = json.loads(hasher.get_pipfile_hash(
+            "/not/written", files={"Pipfile": content}
+        ))
+
+        assert result == on_disk
+
 
 class TestGetPyprojectHash:
-    @patch("hasher.Factory")
+    @patch("poetry.factory.Factory")
     def test_returns_hash(self, mock_factory_cls):
         mock_poetry = MagicMock()
         mock_poetry.locker._get_content_hash.return_value = "xyz789hash"
@@ -112,3 +123,23 @@ class TestGetPyprojectHash:
         mock_factory_cls.return_value.create_poetry.assert_called_once_with(
             "/tmp/project"
         )
+
+    def test_hashes_the_pyproject_from_files(self, tmp_path):
+        content = (
+            "[tool.poetry]\n"
+            "name = 'app'\n"
+            "version = '0.1.0'\n"
+            "description = ''\n"
+            "authors = []\n"
+            "[tool.poetry.dependencies]\n"
+            "python = '^3.9'\n"
+            "requests = '^2.13'\n"
+        )
+        (tmp_path / "pyproject.toml").write_text(content)
+        on_disk = json.loads(hasher.get_pyproject_hash(str(tmp_path)))
+
+        result = json.loads(hasher.get_pyproject_hash(
+            "/not/written", files={"pyproject.toml": content}
+        ))
+
+        assert result == on_disk
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+HELPERS_DIR = os.path.join(os.path.dirname(__file__), os.pardir)
+
+HEAVY_MODULES = {"pip", "setuptools", "poetry", "hashin", "plette"}
+
+
+def import_report(function, args):
+    """Return the top-level packages imported to serve one call.
+
+    Runs the call in a fresh interpreter under `-X importtime` and maps each
+    top-level package to its cumulative import time in microseconds.
+    """
+    script = (
+        "from lib import dispatcher\n"
+        f"dispatcher.call({function!r}, {args!r})\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        cwd=HELPERS_DIR,
+    )
+    assert result.returncode == 0, result.stderr
+
+    report = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        report[package] = report.get(package, 0) + int(cumulative)
+    return report
+
+
+class TestLightPaths:
+    def test_pep621_parsing_skips_heavy_imports(self):
+        report = import_report(
+            "parse_pep621_pep735_dependencies",
+            [os.path.join(FIXTURES, "pep621_dependencies.toml")],
+        )
+
+        assert "tomli" in report
+        assert not HEAVY_MODULES & report.keys()
+
+    def test_pipfile_hash_only_imports_plette(self, tmp_path):
+        (tmp_path / "Pipfile").write_text('[packages]\nrequests = "*"\n')
+
+        report = import_report("get_pipfile_hash", [str(tmp_path)])
+
+        assert "plette" in report
+        assert not (HEAVY_MODULES - {"plette"}) & report.keys()
+
+    def test_requirements_parsing_skips_hashing_modules(self):
+        report = import_report(
+            "parse_requirements", [os.path.join(FIXTURES, "requirements")]
+        )
+
+        assert "pip" in report
+        assert not {"poetry", "hashin", "plette"} & report.keys()
+
+    def test_pip_compile_graph_skips_heavy_imports(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "requests==2.32.3\n    # via -r requirements.in\n"
+        )
+
+        report = import_report(
+            "parse_pip_compile_graph", [str(tmp_path), "requests"]
+        )
+
+        assert not HEAVY_MODULES & report.keys()
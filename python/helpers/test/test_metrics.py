@@ -0,0 +1,138 @@
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from lib import dispatcher, metrics
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PACKAGE = {
+    "info": {"name": "requests"},
+    "releases": {
+        "2.28.0": [{
+            "url": "https://example.com/requests-2.28.0.tar.gz",
+            "digests": {"sha256": "abc123"},
+        }],
+    },
+}
+
+
+@pytest.fixture
+def index_url():
+    body = json.dumps(PACKAGE).encode()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    thread.join()
+
+
+class TestMeasure:
+    def test_counts_files_read(self, tmp_path):
+        (tmp_path / "a.txt").write_text("12345")
+        (tmp_path / "b.txt").write_text("123")
+
+        with metrics.measure() as report:
+            for name in ("a.txt", "b.txt"):
+                with open(tmp_path / name) as f:
+                    f.read()
+            with open(tmp_path / "c.txt", "w") as f:
+                f.write("not counted")
+
+        assert report["files"] == {"read": 2, "bytes": 8}
+        assert report["tracemalloc_peak_kb"] is None
+
+    def test_restores_what_it_patched(self):
+        original = open
+        with metrics.measure():
+            assert open is not original
+        assert open is original
+
+    def test_measures_calls_on_several_threads_at_once(self, tmp_path):
+        (tmp_path / "a.txt").write_text("12345")
+        original = open
+        reports = {}
+        entered = threading.Barrier(2)
+        first_done = threading.Event()
+
+        def call(name, reads):
+            with metrics.measure() as report:
+                entered.wait()
+                for _ in range(reads):
+                    with open(tmp_path / "a.txt") as f:
+                        f.read()
+                if name == "second":
+                    first_done.wait()
+            if name == "first":
+                first_done.set()
+            reports[name] = report
+
+        threads = [
+            threading.Thread(target=call, args=("first", 1)),
+            threading.Thread(target=call, args=("second", 2)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert open is original
+        assert reports["first"]["files"] == {"read": 1, "bytes": 5}
+        assert reports["second"]["files"] == {"read": 2, "bytes": 10}
+
+    def test_traces_allocations_on_request(self):
+        with metrics.measure(trace_allocations=True) as report:
+            data = bytearray(1024 * 1024)
+
+        assert report["tracemalloc_peak_kb"] >= 1024
+        del data
+
+
+class TestMetricsOption:
+    def test_adds_metrics_to_the_response(self):
+        response = dispatcher.call(
+            "parse_requirements",
+            [os.path.join(FIXTURES, "requirements")],
+            {"metrics": True},
+        )
+
+        assert "requests" in {d["name"] for d in response["result"]}
+        assert response["metrics"]["files"]["read"] >= 5
+        assert response["metrics"]["wall_ms"] > 0
+        assert response["metrics"]["peak_rss_kb"] > 0
+
+    def test_counts_network_requests(self, index_url):
+        response = dispatcher.call(
+            "get_dependency_hash",
+            ["requests", "2.28.0", "sha256", index_url],
+            {"metrics": True},
+        )
+
+        assert response["result"] == [{"hash": "abc123"}]
+        network = response["metrics"]["network"]
+        assert network["requests"] == 1
+        assert network["bytes_sent"] > 0
+        assert network["bytes_received"] > len(json.dumps(PACKAGE))
+
+    def test_leaves_the_response_alone_by_default(self):
+        response = dispatcher.call(
+            "parse_requirements", [os.path.join(FIXTURES, "requirements")]
+        )
+
+        assert "metrics" not in response
@@ -1,7 +1,10 @@
+import codecs
 import json
 import os
 import sys
 
+import pytest
+
 sys.path.insert(
     0, os.path.join(os.path.dirname(__file__), os.pardir, "lib")
 )
@@ -101,3 +104,843 @@ class TestParseRequirementsTxt:
         files = {d["file"] for d in deps}
         assert any("requirements.txt" in f for f in files)
         assert any("requirements-dev.txt" in f for f in files)
+
+
+class TestStreaming:
+    def test_streams_the_same_records(self):
+        path = os.path.join(FIXTURES, "requirements")
+        records = []
+
+        trailer = json.loads(parse_requirements(path, emit=records.append))
+
+        assert records == parse("requirements")["result"]
+        assert trailer["errors"] == []
+        assert trailer["summary"] == {
+            "dependencies": len(records),
+            "files": len({r["file"] for r in records}),
+        }
+
+    def test_reports_errors_in_the_trailer(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "requests\n-r missing.txt\n"
+        )
+        records = []
+
+        trailer = json.loads(
+            parse_requirements(str(tmp_path), emit=records.append)
+        )
+
+        assert [r["name"] for r in records] == ["requests"]
+        assert trailer["errors"][0]["error_class"] == "InstallationError"
+        assert trailer["summary"]["dependencies"] == 1
+
+
+class TestInMemoryFiles:
+    def files(self, fixture_dir):
+        directory = os.path.join(FIXTURES, fixture_dir)
+        files = {}
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name)) as f:
+                files[name] = f.read()
+        return files
+
+    def test_parses_the_same_records_as_on_disk(self, tmp_path):
+        missing = str(tmp_path / "not-written")
+
+        result = json.loads(parse_requirements(
+            missing, files=self.files("requirements")
+        ))
+
+        def key(record):
+            return record["file"], record["name"]
+
+        assert sorted(result["result"], key=key) == \
+            sorted(parse("requirements")["result"], key=key)
+
+    def test_resolves_includes_against_the_files(self, tmp_path):
+        result = json.loads(parse_requirements(str(tmp_path), files={
+            "requirements.txt": "-r dev/base.txt\n",
+            "dev/base.txt": "-c ../constraints.in\nrequests\n",
+            "constraints.in": "requests<3\n",
+        }))
+
+        assert {(d["file"], d["name"]) for d in result["result"]} == {
+            ("dev/base.txt", "requests"),
+            ("constraints.in", "requests"),
+        }
+
+    def test_passes_the_files_down_rather_than_patching_pip(
+        self, tmp_path, monkeypatch
+    ):
+        # setuptools has to replace distutils before pip gets to import it
+        import setuptools  # noqa: F401
+        import pip._internal.req.req_file as req_file
+
+        def get_file_content(url, session, **kwargs):
+            raise AssertionError(f"pip read {url}")
+
+        monkeypatch.setattr(req_file, "get_file_content", get_file_content)
+
+        result = json.loads(parse_requirements(str(tmp_path), files={
+            "requirements.txt": "-r base.txt\n-c constraints.txt\n",
+            "base.txt": "requests\n",
+            "constraints.txt": "requests<3\n",
+        }))
+
+        assert "error" not in result
+        assert req_file.get_file_content is get_file_content
+
+    def test_ignores_files_on_disk(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text("requests\n")
+
+        result = json.loads(parse_requirements(str(tmp_path), files={}))
+
+        assert result == {"result": []}
+
+    def test_reports_missing_includes(self, tmp_path):
+        (tmp_path / "extra.txt").write_text("requests\n")
+        records = []
+
+        trailer = json.loads(parse_requirements(
+            str(tmp_path),
+            emit=records.append,
+            files={"requirements.txt": "-r extra.txt\n"},
+        ))
+
+        assert records == []
+        assert trailer["errors"][0]["error_class"] == "InstallationError"
+
+
+class TestKeepGoing:
+    def test_returns_partial_results_and_every_error(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "requests\nnot a valid req!!\nflask\n"
+        )
+        (tmp_path / "broken.txt").write_text("-r missing.txt\n")
+        (tmp_path / "base.in").write_text("django\n")
+
+        result = json.loads(
+            parse_requirements(str(tmp_path), keep_going=True)
+        )
+
+        assert {d["name"] for d in result["result"]} == \
+            {"requests", "flask", "django"}
+        assert sorted(
+            (e["file"], e["line"], e["error_class"]) for e in result["errors"]
+        ) == [
+            ("broken.txt", None, "InstallationError"),
+            ("requirements.txt", 2, "InstallationError"),
+        ]
+
+    def test_reports_no_errors_for_valid_files(self):
+        path = os.path.join(FIXTURES, "requirements")
+
+        result = json.loads(parse_requirements(path, keep_going=True))
+
+        assert result == {
+            "result": parse("requirements")["result"],
+            "errors": [],
+            "includes": {
+                "with_constraints.txt": [
+                    {"file": "constraints.txt", "constraint": True}
+                ],
+            },
+        }
+
+
+class TestDiscovery:
+    FILES = {
+        "requirements.txt": "requests\n",
+        "requirements.in": "flask\n",
+        "b/requirements.txt": "boto3\n",
+        "a/dev.txt": "pytest\n",
+        "a/nested/deep.txt": "black\n",
+        "node_modules/pkg/requirements.txt": "left-pad\n",
+        ".git/info.txt": "not-a-requirement\n",
+        "env/pyvenv.cfg": "home = /usr/bin\n",
+        "env/lib/site-packages/pkg/top_level.txt": "pkg\n",
+        "docs/requirements.txt": "sphinx\n",
+    }
+
+    def files(self, tmp_path, **options):
+        for path, content in self.FILES.items():
+            path = tmp_path / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+        result = json.loads(parse_requirements(str(tmp_path), **options))
+        return [d["file"] for d in result["result"]]
+
+    def test_parses_one_level_below_the_root_in_order(self, tmp_path):
+        assert self.files(tmp_path) == [
+            "requirements.txt",
+            os.path.join("a", "dev.txt"),
+            os.path.join("b", "requirements.txt"),
+            os.path.join("docs", "requirements.txt"),
+            "requirements.in",
+        ]
+
+    def test_follows_max_depth(self, tmp_path):
+        assert self.files(tmp_path, max_depth=0) == [
+            "requirements.txt", "requirements.in"
+        ]
+        assert os.path.join("a", "nested", "deep.txt") in \
+            self.files(tmp_path, max_depth=None)
+
+    def test_prunes_installed_packages_and_hidden_directories(
+        self, tmp_path
+    ):
+        files = self.files(tmp_path, max_depth=None)
+
+        assert not any(
+            f.startswith(("node_modules", ".git", "env")) for f in files
+        )
+
+    def test_skips_ignored_paths(self, tmp_path):
+        files = self.files(
+            tmp_path, max_depth=None, ignore=["docs", "a/nested/*.txt"]
+        )
+
+        assert files == [
+            "requirements.txt",
+            os.path.join("a", "dev.txt"),
+            os.path.join("b", "requirements.txt"),
+            "requirements.in",
+        ]
+
+    def test_walks_in_memory_files_the_same_way(self, tmp_path):
+        on_disk = self.files(tmp_path / "disk", max_depth=None)
+        result = json.loads(parse_requirements(
+            str(tmp_path / "memory"), files=self.FILES, max_depth=None
+        ))
+
+        assert [d["file"] for d in result["result"]] == on_disk
+
+
+class TestPrefilter:
+    def write(self, tmp_path, files):
+        for path, content in files.items():
+            (tmp_path / path).write_bytes(content)
+
+    def test_skips_files_that_are_not_requirements(self, tmp_path):
+        self.write(tmp_path, {
+            "requirements.txt": b"requests==2.32.3\n",
+            "LICENSE.txt": b"MIT License\n\nCopyright (c) 2024\n",
+            "robots.txt": b"User-agent: *\nDisallow: /\n",
+            "data.txt": b"\x00\x01\x02\x03\n",
+        })
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert [d["name"] for d in result["result"]] == ["requests"]
+        assert result["skipped"] == [
+            {"file": "LICENSE.txt",
+             "reason": "line 1 doesn't look like a requirement"},
+            {"file": "data.txt", "reason": "binary file"},
+            {"file": "robots.txt",
+             "reason": "line 1 doesn't look like a requirement"},
+        ]
+
+    def test_parses_plausible_files_whatever_their_name(self, tmp_path):
+        self.write(tmp_path, {
+            "dev.txt": (
+                b"# Tools\n"
+                b"-r base.txt\n"
+                b"--index-url https://pypi.org/simple\n"
+                b"black==24.1.0 \\\n"
+                b"    --hash=sha256:abc\n"
+                b"pytest[testing] >= 7 ; python_version > '3.8'\n"
+                b"flake8\n"
+                b"git+https://github.com/psf/requests#egg=requests\n"
+            ),
+            "base.txt": b"Django~=5.0\n",
+        })
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert "skipped" not in result
+        assert {"Django", "pytest", "flake8"} <= {
+            d["name"] for d in result["result"]
+        }
+
+    def test_parses_options_after_a_bare_name(self, tmp_path):
+        self.write(tmp_path, {
+            "locked.txt": (
+                b"black --hash=sha256:" + b"0" * 64 + b"\n"
+                b"flake8 \\\n"
+                b"    --hash=sha256:" + b"1" * 64 + b"\n"
+                b"pytest --config-settings editable_mode=compat\n"
+            ),
+        })
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert "skipped" not in result
+        assert [d["name"] for d in result["result"]] == [
+            "black", "flake8", "pytest"
+        ]
+
+    def test_parses_every_file_without_the_prefilter(self, tmp_path):
+        self.write(tmp_path, {"notes.txt": b"Remember to update\n"})
+
+        result = json.loads(parse_requirements(
+            str(tmp_path), prefilter=False, keep_going=True
+        ))
+
+        assert "skipped" not in result
+        assert result["errors"][0]["file"] == "notes.txt"
+
+
+class TestIncludes:
+    def write(self, tmp_path, files):
+        for path, content in files.items():
+            (tmp_path / path).write_text(content)
+
+    def test_parses_each_file_once(self, tmp_path, monkeypatch):
+        import parser
+
+        environments = [f"env{i:02}.txt" for i in range(20)]
+        self.write(tmp_path, {
+            "base.txt": "requests==2.32.3\n-c constraints.txt\n",
+            "constraints.txt": "urllib3<3\n",
+            **{name: f"-r base.txt\nflask=={i}.0\n"
+               for i, name in enumerate(environments)},
+        })
+        reads = []
+        file_lines = parser.file_lines
+        monkeypatch.setattr(
+            parser,
+            "file_lines",
+            lambda files, path, *args: reads.append(path) or file_lines(
+                files, path, *args
+            ),
+        )
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        # constraints.txt is parsed on its own and as constraints
+        assert sorted(os.path.basename(path) for path in reads) == sorted(
+            ["base.txt", "constraints.txt", "constraints.txt"] + environments
+        )
+        # As if pip had parsed every file, with its includes, on its own
+        base = [d for d in result["result"] if d["file"] == "base.txt"]
+        assert len(base) == 21
+        assert [d["file"] for d in result["result"][:5]] == [
+            "base.txt", "constraints.txt", "constraints.txt",
+            "base.txt", "constraints.txt",
+        ]
+
+    def record_reads(self, monkeypatch):
+        import parser
+
+        reads = []
+        file_lines = parser.file_lines
+        monkeypatch.setattr(
+            parser,
+            "file_lines",
+            lambda files, path, *args: reads.append(path) or file_lines(
+                files, path, *args
+            ),
+        )
+        return reads
+
+    def test_parses_large_files_once(self, tmp_path, monkeypatch):
+        self.write(tmp_path, {
+            "base.txt": "".join(f"package{i}=={i}\n" for i in range(1500)),
+            "dev.txt": "-r base.txt\npytest\n",
+            "test.txt": "-r base.txt\nflask\n",
+        })
+        reads = self.record_reads(monkeypatch)
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert sorted(os.path.basename(path) for path in reads) == [
+            "base.txt", "dev.txt", "test.txt"
+        ]
+        assert len(result["result"]) == 3 * 1500 + 2
+
+    def test_parses_large_files_again_when_streaming(
+        self, tmp_path, monkeypatch
+    ):
+        import parser
+
+        self.write(tmp_path, {
+            "base.txt": "--extra-index-url https://pypi.example.com/simple\n"
+                        "requests==2.32.3\nurllib3<3\n",
+            "dev.txt": "-r base.txt\npytest\n",
+            "test.txt": "-r base.txt\nflask\n",
+        })
+        expected = json.loads(parse_requirements(str(tmp_path)))
+        monkeypatch.setattr(parser, "MAX_REPLAYED", 1)
+        reads = self.record_reads(monkeypatch)
+        records = []
+
+        trailer = json.loads(
+            parse_requirements(str(tmp_path), emit=records.append)
+        )
+
+        assert [os.path.basename(path) for path in reads].count(
+            "base.txt"
+        ) == 3
+        assert records == expected["result"]
+        assert trailer["index_options"] == expected["index_options"]
+
+    def test_hands_every_line_to_pip_without_the_fast_path(self, tmp_path):
+        self.write(tmp_path, {
+            "requirements.txt": "--index-url https://pypi.example.com\n"
+                                "-r base.txt\n-c constraints.txt\n"
+                                "-e git+https://example.com/repo.git#egg=a\n"
+                                "flask[async]>=2\n",
+            "base.txt": "requests==2.32.3\n",
+            "constraints.txt": "urllib3<3\n",
+        })
+
+        result = json.loads(
+            parse_requirements(str(tmp_path), fast_path=False)
+        )
+
+        assert [(d["file"], d["name"]) for d in result["result"]] == [
+            ("base.txt", "requests"),
+            ("constraints.txt", "urllib3"),
+            ("base.txt", "requests"),
+            ("constraints.txt", "urllib3"),
+            ("requirements.txt", "a"),
+            ("requirements.txt", "flask"),
+        ]
+        assert result["includes"]["requirements.txt"] == [
+            {"file": "base.txt", "constraint": False},
+            {"file": "constraints.txt", "constraint": True},
+        ]
+        assert result["index_options"] == {
+            "requirements.txt": {
+                "index_url": "https://pypi.example.com",
+                "extra_index_urls": [],
+                "find_links": [],
+            },
+        }
+
+    def test_returns_the_include_graph(self, tmp_path):
+        (tmp_path / "envs").mkdir()
+        self.write(tmp_path, {
+            "requirements.txt": "-r envs/dev.txt\n-c constraints.txt\n",
+            "envs/dev.txt": "-r ../base.in\npytest\n",
+            "base.in": "requests\n",
+            "constraints.txt": "requests<3\n",
+        })
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert result["includes"] == {
+            "requirements.txt": [
+                {"file": os.path.join("envs", "dev.txt"),
+                 "constraint": False},
+                {"file": "constraints.txt", "constraint": True},
+            ],
+            os.path.join("envs", "dev.txt"): [
+                {"file": "base.in", "constraint": False},
+            ],
+        }
+
+    def test_reports_include_cycles(self, tmp_path):
+        self.write(tmp_path, {
+            "a.txt": "-r b.txt\nrequests\n",
+            "b.txt": "-r a.txt\nflask\n",
+        })
+
+        result = json.loads(
+            parse_requirements(str(tmp_path), keep_going=True)
+        )
+
+        assert [e["error_class"] for e in result["errors"]] == [
+            "RequirementsFileParseError", "RequirementsFileParseError"
+        ]
+        assert [e["file"] for e in result["errors"]] == ["a.txt", "b.txt"]
+        assert "recursively references itself" in result["errors"][0]["error"]
+
+    def test_reports_include_cycles_through_relative_paths(self, tmp_path):
+        (tmp_path / "envs").mkdir()
+        self.write(tmp_path, {
+            "a.txt": "-r ./envs/b.txt\nrequests\n",
+            "envs/b.txt": "-r ../a.txt\nflask\n",
+        })
+
+        result = json.loads(
+            parse_requirements(str(tmp_path), keep_going=True)
+        )
+
+        assert [e["error_class"] for e in result["errors"]] == [
+            "RequirementsFileParseError", "RequirementsFileParseError"
+        ]
+        assert (
+            f"{tmp_path / 'a.txt'} recursively references itself in "
+            f"{tmp_path / 'envs' / 'b.txt'}"
+        ) in result["errors"][0]["error"]
+
+    def test_parses_a_file_included_under_two_spellings_once(
+        self, tmp_path, monkeypatch
+    ):
+        import parser
+
+        (tmp_path / "envs").mkdir()
+        self.write(tmp_path, {
+            "dev.txt": "-r base.txt\npytest\n",
+            "envs/test.txt": "-r ../envs/../base.txt\n-r ./../base.txt\n",
+            "base.txt": "requests==2.32.3\n",
+        })
+        reads = []
+        file_lines = parser.file_lines
+        monkeypatch.setattr(
+            parser,
+            "file_lines",
+            lambda files, path, *args: reads.append(path) or file_lines(
+                files, path, *args
+            ),
+        )
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert sorted(reads) == [
+            str(tmp_path / name)
+            for name in ("base.txt", "dev.txt", "envs/test.txt")
+        ]
+        assert [d["file"] for d in result["result"]] == [
+            "base.txt", "base.txt", "dev.txt", "base.txt", "base.txt",
+        ]
+
+    def test_reports_a_broken_include_for_each_file_including_it(
+        self, tmp_path
+    ):
+        self.write(tmp_path, {
+            "base.txt": "-r missing.txt\n",
+            "dev.txt": "pytest\n-r base.txt\n",
+            "test.txt": "-r base.txt\n",
+        })
+
+        result = json.loads(
+            parse_requirements(str(tmp_path), keep_going=True)
+        )
+
+        assert [e["file"] for e in result["errors"]] == [
+            "base.txt", "dev.txt", "test.txt"
+        ]
+        assert [d["name"] for d in result["result"]] == ["pytest"]
+
+    def test_names_a_missing_constraints_file(self, tmp_path):
+        self.write(tmp_path, {"requirements.txt": "-c missing.txt\n"})
+
+        result = json.loads(
+            parse_requirements(str(tmp_path), keep_going=True)
+        )
+
+        assert "Could not open constraint file:" in \
+            result["errors"][0]["error"]
+
+
+class TestDecoding:
+    def test_reads_the_coding_comment(self, tmp_path):
+        (tmp_path / "requirements.txt").write_bytes(
+            "# -*- coding: latin-1 -*-\nrequests==2.31.0  # café\n"
+            .encode("latin-1")
+        )
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert [d["name"] for d in result["result"]] == ["requests"]
+
+    def test_reads_utf_8_before_the_locale_encoding(
+        self, tmp_path, monkeypatch
+    ):
+        import locale
+
+        monkeypatch.setattr(
+            locale, "getpreferredencoding", lambda do_setlocale: "ascii"
+        )
+        (tmp_path / "requirements.txt").write_bytes(
+            "requests==2.31.0  # café\n".encode()
+        )
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert [d["name"] for d in result["result"]] == ["requests"]
+
+    def test_falls_back_to_the_locale_encoding(self, tmp_path, monkeypatch):
+        import locale
+
+        monkeypatch.setattr(
+            locale, "getpreferredencoding", lambda do_setlocale: "latin-1"
+        )
+        (tmp_path / "requirements.txt").write_bytes(
+            "requests==2.31.0  # café\n".encode("latin-1")
+        )
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert [d["name"] for d in result["result"]] == ["requests"]
+
+
+BASELINE = "parse_requirements_baseline.json"
+SPEC_BASELINE = "parse_requirements_spec_baseline.json"
+SPEC_FIXTURES = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "spec", "fixtures"
+)
+
+FIXTURE_DIRECTORIES = [FIXTURES] + sorted(
+    entry.path for entry in os.scandir(FIXTURES) if entry.is_dir()
+)
+
+
+class TestOffline:
+    def test_reports_remote_includes_without_a_session(
+        self, tmp_path, monkeypatch
+    ):
+        # setuptools has to replace distutils before pip gets to import it
+        import setuptools  # noqa: F401
+        from pip._internal.network import session
+
+        def no_session(*args, **kwargs):
+            raise AssertionError("A PipSession was set up")
+
+        monkeypatch.setattr(session.PipSession, "__init__", no_session)
+        (tmp_path / "requirements.txt").write_text(
+            "-c https://example.com/constraints.txt\nrequests\n"
+        )
+
+        result = json.loads(parse_requirements(str(tmp_path), offline=True))
+
+        assert [d["name"] for d in result["result"]] == ["requests"]
+        assert result["unresolved"] == [{
+            "file": "requirements.txt",
+            "url": "https://example.com/constraints.txt",
+            "constraint": True,
+        }]
+
+    @pytest.mark.parametrize("directory", FIXTURE_DIRECTORIES)
+    def test_matches_the_output_from_before_the_option(self, directory):
+        # What the parser returned for each fixture directory before it
+        # walked includes itself, by file, in the order of each file
+        with open(os.path.join(FIXTURES, BASELINE)) as f:
+            expected = json.load(f)[os.path.relpath(directory, FIXTURES)]
+
+        for keep_going in (False, True):
+            for offline in (False, True):
+                result = json.loads(parse_requirements(
+                    directory, max_depth=None, keep_going=keep_going,
+                    offline=offline,
+                ))
+
+                assert result.get("errors", []) == []
+                records = {}
+                for record in result["result"]:
+                    records.setdefault(record["file"], []).append(record)
+                assert records == expected
+
+    @pytest.mark.parametrize("path", sorted(json.load(
+        open(os.path.join(FIXTURES, SPEC_BASELINE))
+    )))
+    def test_matches_the_earlier_output_for_spec_fixtures(
+        self, path, tmp_path, capsys
+    ):
+        # What the parser returned for each requirement file of the Ruby
+        # specs, on its own in a directory, before it walked includes
+        # itself. Errors are compared by class, as pip words them
+        # differently from version to version.
+        with open(os.path.join(FIXTURES, SPEC_BASELINE)) as f:
+            expected = json.load(f)[path]
+        source = os.path.join(SPEC_FIXTURES, path)
+        with open(source, "rb") as f:
+            (tmp_path / os.path.basename(source)).write_bytes(f.read())
+
+        for offline in (False, True):
+            if "error_class" in expected:
+                with pytest.raises(SystemExit):
+                    parse_requirements(
+                        str(tmp_path), prefilter=False, offline=offline
+                    )
+                result = json.loads(capsys.readouterr().out)
+                assert result["error"].startswith(
+                    expected["error_class"] + "("
+                )
+            else:
+                result = json.loads(parse_requirements(
+                    str(tmp_path), prefilter=False, offline=offline
+                ))
+                assert result["result"] == expected["result"]
+
+
+class TestWorkers:
+    def write_tree(self, tmp_path):
+        (tmp_path / "base.txt").write_text(
+            "-i https://pypi.example.com/simple\nrequests==2.32.3\n"
+        )
+        for i in range(12):
+            (tmp_path / f"env{i:02}.txt").write_text(
+                f"-r base.txt\nflask=={i}.0\n"
+                + ("django=>4\n" if i % 5 == 0 else "")
+            )
+
+    @pytest.mark.parametrize("directory", FIXTURE_DIRECTORIES)
+    def test_matches_the_sequential_output(self, directory):
+        assert parse_requirements(directory, max_depth=None) == \
+            parse_requirements(directory, max_depth=None, workers=2)
+
+    def test_merges_records_and_errors_in_order(self, tmp_path):
+        self.write_tree(tmp_path)
+
+        sequential = parse_requirements(str(tmp_path), keep_going=True)
+        parallel = parse_requirements(
+            str(tmp_path), keep_going=True, workers=3
+        )
+
+        assert parallel == sequential
+        assert list(json.loads(parallel)["index_options"]) == ["base.txt"]
+        assert [e["file"] for e in json.loads(parallel)["errors"]] == [
+            "env00.txt", "env05.txt", "env10.txt"
+        ]
+
+    def test_stops_at_the_first_failing_file(self, tmp_path, capsys):
+        self.write_tree(tmp_path)
+
+        with pytest.raises(SystemExit):
+            parse_requirements(str(tmp_path), workers=3)
+
+        assert "django=>4" in capsys.readouterr().out
+
+
+class TestSourceSpans:
+    CONTENT = (
+        "# pinned\n"
+        "requests==2.31.0 \\\n"
+        "    --hash=sha256:abc \\\n"
+        "    # via flask\n"
+        "  Flask[async]>=2.0  # web\r\n"
+        "-e git+https://github.com/pallets/click.git#egg=click\n"
+        "-r base.txt\n"
+    )
+
+    def parse(self, tmp_path, **options):
+        return json.loads(parse_requirements(
+            str(tmp_path), source_spans=True, **options
+        ))["result"]
+
+    def test_spans_each_requirement(self, tmp_path):
+        (tmp_path / "requirements.txt").write_bytes(
+            codecs.BOM_UTF8 + self.CONTENT.encode()
+        )
+        (tmp_path / "base.txt").write_text("idna<4\n")
+
+        records = self.parse(tmp_path)
+
+        assert [(d["file"], d["span"]["lines"]) for d in records] == [
+            ("base.txt", [1, 1]),
+            ("requirements.txt", [2, 4]),
+            ("requirements.txt", [5, 5]),
+            ("requirements.txt", [6, 6]),
+            ("base.txt", [1, 1]),
+        ]
+        assert [
+            (tmp_path / d["file"]).read_bytes()[slice(*d["span"]["bytes"])]
+            for d in records
+        ] == [
+            b"idna<4",
+            b"requests==2.31.0 \\\n    --hash=sha256:abc \\\n    # via flask",
+            b"Flask[async]>=2.0  # web",
+            b"-e git+https://github.com/pallets/click.git#egg=click",
+            b"idna<4",
+        ]
+
+    def test_spans_the_same_without_the_fast_path(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(self.CONTENT)
+        (tmp_path / "base.txt").write_text("idna<4\n")
+
+        assert self.parse(tmp_path) == self.parse(tmp_path, fast_path=False)
+
+    def test_leaves_records_alone_by_default(self):
+        assert not any("span" in d for d in parse("requirements")["result"])
+
+
+class TestHashes:
+    def parse(self, tmp_path, **options):
+        return json.loads(parse_requirements(
+            str(tmp_path), hashes=True, **options
+        ))["result"]
+
+    def test_returns_the_hashes_and_their_separator(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "requests==2.31.0 \\\n"
+            "    --hash=sha256:aaa \\\n"
+            "    --hash=sha256:bbb\n"
+            "    # via flask\n"
+            "idna==3.4 --hash=sha512:ccc  # --hash=sha256:ddd\n"
+            "flask\n"
+        )
+
+        records = self.parse(tmp_path)
+
+        assert [(d["hashes"], d["hash_separator"]) for d in records] == [
+            (
+                [
+                    {"algorithm": "sha256", "value": "aaa"},
+                    {"algorithm": "sha256", "value": "bbb"},
+                ],
+                " \\\n    ",
+            ),
+            ([{"algorithm": "sha512", "value": "ccc"}], " "),
+            ([], None),
+        ]
+
+    def test_keeps_the_line_breaks_of_the_separator(self, tmp_path):
+        (tmp_path / "requirements.txt").write_bytes(
+            b"requests==2.31.0 \\\r\n"
+            b"    --hash=sha256:aaa \\\r\n"
+            b"    --hash=sha256:bbb\r\n"
+            b"idna==3.4 \\\r\n"
+            b"    --hash=sha512:ccc\r\n"
+        )
+
+        records = self.parse(tmp_path)
+
+        assert [d["hash_separator"] for d in records] == [
+            " \\\r\n    ", " \\\r\n    "
+        ]
+
+    def test_returns_the_same_hashes_without_the_fast_path(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "requests==2.31.0 --hash=sha256:aaa --hash=sha256:bbb\n"
+            "click @ https://example.com/click.tar.gz --hash=sha256:ccc\n"
+        )
+
+        assert self.parse(tmp_path) == self.parse(tmp_path, fast_path=False)
+
+    def test_leaves_records_alone_by_default(self):
+        assert not any(
+            "hashes" in d for d in parse("requirements")["result"]
+        )
+
+
+class TestIndexOptions:
+    def test_returns_the_index_options_of_each_file(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "--index-url https://pypi.example.com/simple\n"
+            "--extra-index-url=https://extra.example.com/simple\n"
+            "-f ./wheels\n"
+            "requests\n"
+            "-r base.txt\n"
+        )
+        (tmp_path / "base.txt").write_text("-i https://other/simple\nsix\n")
+
+        result = json.loads(parse_requirements(str(tmp_path)))
+
+        assert result["index_options"] == {
+            "base.txt": {
+                "index_url": "https://other/simple",
+                "extra_index_urls": [],
+                "find_links": [],
+            },
+            "requirements.txt": {
+                "index_url": "https://pypi.example.com/simple",
+                "extra_index_urls": ["https://extra.example.com/simple"],
+                "find_links": ["./wheels"],
+            },
+        }
+
+    def test_leaves_out_files_without_index_options(self):
+        assert "index_options" not in parse("requirements")
@@ -125,3 +125,73 @@ class TestSetupCfg:
         result = parse("requirements_empty")
         deps = result["result"]
         assert deps == []
+
+
+class TestStreaming:
+    def test_streams_the_same_records(self):
+        path = os.path.join(FIXTURES, "setup_py")
+        records = []
+
+        trailer = json.loads(parse_setup(path, emit=records.append))
+
+        assert records == parse("setup_py")["result"]
+        assert trailer == {
+            "errors": [],
+            "summary": {"dependencies": len(records), "files": 1},
+        }
+
+
+class TestInMemoryFiles:
+    def test_parses_setup_py_and_setup_cfg(self, tmp_path):
+        files = {}
+        for name in ("setup_py/setup.py", "setup_cfg/setup.cfg"):
+            with open(os.path.join(FIXTURES, name)) as f:
+                files[os.path.basename(name)] = f.read()
+
+        result = json.loads(parse_setup(str(tmp_path), files=files))
+
+        assert result["result"] == \
+            parse("setup_py")["result"] + parse("setup_cfg")["result"]
+
+    def test_setup_py_opens_files_from_the_map(self, tmp_path):
+        files = {
+            "setup.py": (
+                "from setuptools import setup\n"
+                "with open('requirements.txt') as f:\n"
+                "    requires = f.read().splitlines()\n"
+                "setup(name='app', install_requires=requires)\n"
+            ),
+            "requirements.txt": "requests==2.32.3\n",
+        }
+
+        result = json.loads(parse_setup(str(tmp_path), files=files))
+
+        [requests] = result["result"]
+        assert requests["name"] == "requests"
+        assert requests["version"] == "2.32.3"
+
+
+class TestKeepGoing:
+    def test_returns_partial_results_and_every_error(self, tmp_path):
+        (tmp_path / "setup.py").write_text(
+            "from setuptools import setup\n"
+            "setup(install_requires=['requests', 'bad req!!'])\n"
+            "raise ValueError('after setup()')\n"
+        )
+        (tmp_path / "setup.cfg").write_text(
+            "[options]\ninstall_requires =\n    flask\n    bad!!\n"
+        )
+
+        result = json.loads(parse_setup(str(tmp_path), keep_going=True))
+
+        assert [(d["file"], d["name"]) for d in result["result"]] == [
+            ("setup.py", "requests"),
+            ("setup.cfg", "flask"),
+        ]
+        assert [
+            (e["file"], e["line"], e["error_class"]) for e in result["errors"]
+        ] == [
+            ("setup.py", None, "InstallationError"),
+            ("setup.py", 3, "ValueError"),
+            ("setup.cfg", None, "InstallationError"),
+        ]
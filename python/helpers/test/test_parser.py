@@ -2,6 +2,8 @@ import json
 import os
 import sys
 
+import pytest
+
 # Add the helpers lib directory to the Python path so we can import parser
 sys.path.insert(
     0, os.path.join(os.path.dirname(__file__), os.pardir, "lib")
@@ -263,3 +265,148 @@ class TestSourceRequirement:
         deps = parse("pep735_dependency_groups.toml")
         pytest_dep = find_dep(deps, "pytest")
         assert pytest_dep["source_requirement"] == "==7.1.3"
+
+
+# ---------------------------------------------------------------------------
+# Streaming output
+# ---------------------------------------------------------------------------
+class TestStreaming:
+    def test_streams_the_same_records(self):
+        path = os.path.join(FIXTURES, "pep735_dependency_groups.toml")
+        records = []
+
+        trailer = json.loads(
+            parse_pep621_pep735_dependencies(path, emit=records.append)
+        )
+
+        assert records == parse("pep735_dependency_groups.toml")
+        assert trailer["errors"] == []
+        assert trailer["summary"]["dependencies"] == len(records)
+
+    def test_reports_invalid_requirements_in_the_trailer(self, tmp_path):
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_text(
+            '[project]\ndependencies = ["requests", "not a req!"]\n'
+        )
+        records = []
+
+        trailer = json.loads(
+            parse_pep621_pep735_dependencies(
+                str(pyproject), emit=records.append
+            )
+        )
+
+        assert [r["name"] for r in records] == ["requests"]
+        assert trailer["errors"][0]["error_class"] == "InvalidRequirement"
+
+
+# ---------------------------------------------------------------------------
+# In-memory files
+# ---------------------------------------------------------------------------
+class TestInMemoryFiles:
+    def test_parses_pyproject_from_the_files(self, tmp_path):
+        with open(os.path.join(FIXTURES, "pep621_dependencies.toml")) as f:
+            files = {"pyproject.toml": f.read()}
+        path = str(tmp_path / "pyproject.toml")
+
+        result = json.loads(
+            parse_pep621_pep735_dependencies(path, files=files)
+        )
+
+        expected = parse("pep621_dependencies.toml")
+        for dep in expected:
+            dep["file"] = path
+        assert result["result"] == expected
+
+
+# ---------------------------------------------------------------------------
+# Keeping going after errors
+# ---------------------------------------------------------------------------
+class TestKeepGoing:
+    def test_reports_each_invalid_requirement_with_its_line(self, tmp_path):
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_text(
+            "[project]\n"
+            "dependencies = [\n"
+            '  "requests",\n'
+            '  "not a req!",\n'
+            "]\n"
+            "[dependency-groups]\n"
+            'dev = ["pytest", "also bad!"]\n'
+        )
+
+        result = json.loads(parse_pep621_pep735_dependencies(
+            str(pyproject), keep_going=True
+        ))
+
+        assert [d["name"] for d in result["result"]] == \
+            ["requests", "pytest"]
+        assert [
+            (e["file"], e["line"], e["error_class"]) for e in result["errors"]
+        ] == [
+            (str(pyproject), 4, "InvalidRequirement"),
+            (str(pyproject), 7, "InvalidRequirement"),
+        ]
+
+    def test_reports_invalid_toml(self, tmp_path):
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_text("[project]\ndependencies = [\n")
+
+        result = json.loads(parse_pep621_pep735_dependencies(
+            str(pyproject), keep_going=True
+        ))
+
+        assert result["result"] == []
+        [error] = result["errors"]
+        assert error["error_class"] == "TOMLDecodeError"
+        assert error["line"] == 3
+
+
+class TestUvEcosystem:
+    def parse(self, ecosystem):
+        path = os.path.join(FIXTURES, "pep621_uv_sources.toml")
+        return json.loads(
+            parse_pep621_pep735_dependencies(path, ecosystem=ecosystem)
+        )["result"]
+
+    def test_labels_requirement_types_like_the_uv_parser(self):
+        deps = self.parse("uv")
+
+        assert find_dep(deps, "requests")["requirement_type"] is None
+        assert find_dep(deps, "PySocks")["requirement_type"] is None
+        assert find_dep(deps, "hatchling")["requirement_type"] == \
+            "build-system"
+
+    def test_returns_uv_source_path_dependencies(self):
+        deps = self.parse("uv")
+
+        path_deps = [d for d in deps if d.get("path_dependency")]
+        assert path_deps == [{
+            "name": "mylib",
+            "version": None,
+            "markers": None,
+            "file": os.path.join(FIXTURES, "pep621_uv_sources.toml"),
+            "requirement": None,
+            "extras": [],
+            "path_dependency": True,
+            "path": "../mylib",
+        }]
+
+    def test_keeps_source_requirements(self):
+        deps = self.parse("uv")
+
+        assert find_dep(deps, "requests")["source_requirement"] == \
+            ">=2.13.0,<3.0"
+
+    def test_python_ignores_uv_sources(self):
+        deps = self.parse("python")
+
+        assert not any(d.get("path_dependency") for d in deps)
+        assert find_dep(deps, "requests")["requirement_type"] == \
+            "dependencies"
+        assert find_dep(deps, "hatchling")["requirement_type"] == \
+            "build-system.requires"
+
+    def test_rejects_unknown_ecosystems(self):
+        with pytest.raises(ValueError, match="Unknown ecosystem: conda"):
+            self.parse("conda")
@@ -0,0 +1,61 @@
+import os
+import pstats
+
+from lib import dispatcher, profiling
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class TestProfileOption:
+    def test_writes_a_dump_and_a_summary(self, tmp_path):
+        path = str(tmp_path / "setup.pstats")
+
+        response = dispatcher.call(
+            "parse_setup",
+            [os.path.join(FIXTURES, "setup_py")],
+            {"profile": path},
+        )
+
+        assert "requests" in {d["name"] for d in response["result"]}
+        assert response["profile"]["path"] == path
+        top = response["profile"]["top"]
+        assert 0 < len(top) <= profiling.TOP
+        assert any("setup_records" in entry["function"] for entry in top)
+        assert pstats.Stats(path).total_calls > 0
+
+    def test_profiles_every_call_with_the_environment_variable(
+        self, tmp_path, monkeypatch
+    ):
+        monkeypatch.setenv(profiling.ENVIRONMENT_VARIABLE, str(tmp_path))
+
+        response = dispatcher.call(
+            "parse_pep621_pep735_dependencies",
+            [os.path.join(FIXTURES, "pep621_dependencies.toml")],
+        )
+
+        dump = response["profile"]["path"]
+        assert os.path.dirname(dump) == str(tmp_path)
+        assert os.path.basename(dump).startswith(
+            "parse_pep621_pep735_dependencies-"
+        )
+        assert os.path.exists(dump)
+
+    def test_leaves_the_response_alone_by_default(self, monkeypatch):
+        monkeypatch.delenv(profiling.ENVIRONMENT_VARIABLE, raising=False)
+
+        response = dispatcher.call(
+            "parse_pep621_pep735_dependencies",
+            [os.path.join(FIXTURES, "pep621_dependencies.toml")],
+        )
+
+        assert "profile" not in response
+
+
+class TestSummary:
+    def test_sorts_by_cumulative_time(self, tmp_path):
+        with profiling.profiled(str(tmp_path / "dump.pstats"), top=5) as r:
+            sorted(range(1000), key=str)
+
+        cumulative = [entry["cumulative_ms"] for entry in r["top"]]
+        assert cumulative == sorted(cumulative, reverse=True)
+        assert len(r["top"]) <= 5
@@ -47,3 +47,347 @@ class TestRunRouting:
         assert "result" in result
         names = {d["name"] for d in result["result"]}
         assert "requests" in names
+
+
+def serve_helper(requests, mode="--serve"):
+    input_lines = "".join(json.dumps(r) + "\n" for r in requests)
+    result = subprocess.run(
+        [sys.executable, RUN_PY, mode],
+        input=input_lines,
+        capture_output=True,
+        text=True,
+        cwd=HELPERS_DIR,
+    )
+    assert result.returncode == 0, (
+        f"run.py {mode} failed: {result.stderr}"
+    )
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+class TestServeMode:
+    def test_answers_each_request_with_its_id(self):
+        responses = serve_helper([
+            {
+                "id": 1,
+                "function": "parse_pep621_pep735_dependencies",
+                "args": [os.path.join(FIXTURES, "pep621_dependencies.toml")],
+            },
+            {
+                "id": "two",
+                "function": "parse_setup",
+                "args": [os.path.join(FIXTURES, "setup_py")],
+            },
+        ])
+
+        assert [r["id"] for r in responses] == [1, "two"]
+        for response in responses:
+            names = {d["name"] for d in response["result"]}
+            assert "requests" in names
+
+    def test_survives_a_failing_request(self, tmp_path):
+        invalid = tmp_path / "pyproject.toml"
+        invalid.write_text('[project]\ndependencies = ["not a req!"]\n')
+
+        responses = serve_helper([
+            {
+                "id": 1,
+                "function": "parse_pep621_pep735_dependencies",
+                "args": [str(invalid)],
+            },
+            {
+                "id": 2,
+                "function": "parse_requirements",
+                "args": [os.path.join(FIXTURES, "requirements")],
+            },
+        ])
+
+        assert responses[0]["id"] == 1
+        assert "InvalidRequirement" in responses[0]["error"]
+        assert responses[1]["id"] == 2
+        assert "result" in responses[1]
+
+    def test_reports_unknown_functions_and_bad_json(self):
+        input_lines = '{"id": 1, "function": "nope", "args": []}\nnot json\n'
+        result = subprocess.run(
+            [sys.executable, RUN_PY, "--serve"],
+            input=input_lines,
+            capture_output=True,
+            text=True,
+            cwd=HELPERS_DIR,
+        )
+        responses = [json.loads(line) for line in result.stdout.splitlines()]
+
+        assert responses[0] == {"error": "Unknown function: nope", "id": 1}
+        assert responses[1]["id"] is None
+        assert "error" in responses[1]
+
+    def test_survives_requests_that_are_not_objects(self):
+        responses = serve_helper([
+            [1, 2],
+            "x",
+            {
+                "id": 3,
+                "function": "parse_requirements",
+                "args": [os.path.join(FIXTURES, "requirements")],
+            },
+        ])
+
+        assert [r["id"] for r in responses] == [None, None, 3]
+        assert [r.get("error_class") for r in responses[:2]] == [
+            "ValueError", "ValueError"
+        ]
+        assert "result" in responses[2]
+
+
+class TestBatch:
+    def test_returns_one_response_per_call_in_order(self, tmp_path):
+        invalid = tmp_path / "pyproject.toml"
+        invalid.write_text('[project]\ndependencies = ["not a req!"]\n')
+
+        result = run_helper("batch", [
+            {
+                "function": "parse_setup",
+                "args": [os.path.join(FIXTURES, "setup_py")],
+            },
+            {
+                "function": "parse_pep621_pep735_dependencies",
+                "args": [str(invalid)],
+            },
+            {
+                "function": "parse_requirements",
+                "args": [os.path.join(FIXTURES, "requirements")],
+            },
+        ])
+
+        first, second, third = result["result"]
+        assert "requests" in {d["name"] for d in first["result"]}
+        assert "InvalidRequirement" in second["error"]
+        assert "result" not in second
+        assert "requests" in {d["name"] for d in third["result"]}
+
+    def test_batch_in_serve_mode(self):
+        responses = serve_helper([{
+            "id": 7,
+            "function": "batch",
+            "args": [{"function": "nope", "args": []}],
+        }])
+
+        assert responses == [{
+            "result": [{"error": "Unknown function: nope"}],
+            "id": 7,
+        }]
+
+
+class TestPreforkMode:
+    def test_runs_setup_py_repeatedly(self):
+        setup_py = os.path.join(FIXTURES, "setup_py")
+        responses = serve_helper([
+            {"id": 1, "function": "parse_setup", "args": [setup_py]},
+            {"id": 2, "function": "parse_setup", "args": [setup_py]},
+        ], mode="--prefork")
+
+        assert [r["id"] for r in responses] == [1, 2]
+        assert responses[0]["result"] == responses[1]["result"]
+
+    def test_isolates_a_crashing_setup_py(self, tmp_path):
+        (tmp_path / "setup.py").write_text("import os\nos._exit(3)\n")
+
+        responses = serve_helper([
+            {"id": 1, "function": "parse_setup", "args": [str(tmp_path)]},
+            {
+                "id": 2,
+                "function": "parse_setup",
+                "args": [os.path.join(FIXTURES, "setup_py")],
+            },
+        ], mode="--prefork")
+
+        assert responses[0]["id"] == 1
+        assert responses[0]["error"] == "Helper process exited with status 3"
+        assert "requests" in {d["name"] for d in responses[1]["result"]}
+
+    def test_answers_a_request_that_is_not_an_object_without_forking(
+        self, monkeypatch
+    ):
+        from lib import prefork
+
+        def fork():
+            raise AssertionError("forked")
+
+        monkeypatch.setattr(os, "fork", fork)
+        lines = []
+
+        prefork.handle_in_child([1], lines.append)
+
+        assert lines == [{
+            "error": "ValueError('Requests must be JSON objects, not list')",
+            "error_class": "ValueError",
+            "id": None,
+        }]
+
+
+class TestLauncher:
+    def run_launcher(self, tmp_path, env):
+        launcher = os.path.join(HELPERS_DIR, "run")
+        fixture = os.path.join(FIXTURES, "pep621_dependencies.toml")
+        result = subprocess.run(
+            [launcher],
+            input=json.dumps({
+                "function": "parse_pep621_pep735_dependencies",
+                "args": [fixture],
+            }),
+            capture_output=True,
+            text=True,
+            cwd=tmp_path,
+            env={"PATH": os.environ["PATH"], **env},
+        )
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout)
+
+    def fake_pyenv_root(self, tmp_path, version):
+        bin_dir = tmp_path / "pyenv" / "versions" / version / "bin"
+        bin_dir.mkdir(parents=True)
+        (bin_dir / "python3").symlink_to(sys.executable)
+        return str(tmp_path / "pyenv")
+
+    def test_resolves_major_minor_from_python_version_file(self, tmp_path):
+        pyenv_root = self.fake_pyenv_root(tmp_path, "3.99.1")
+        project = tmp_path / "project"
+        project.mkdir()
+        (project / ".python-version").write_text("3.99\n")
+
+        result = self.run_launcher(project, {"PYENV_ROOT": pyenv_root})
+
+        assert "requests" in {d["name"] for d in result["result"]}
+
+    def test_picks_the_newest_install_of_major_minor(self, tmp_path):
+        pyenv_root = self.fake_pyenv_root(tmp_path, "3.99.15")
+        for version in ("3.99.9", "3.99.2-dev"):
+            older = tmp_path / "pyenv" / "versions" / version / "bin"
+            older.mkdir(parents=True)
+            (older / "python3").write_text("#!/bin/sh\nexit 7\n")
+            (older / "python3").chmod(0o755)
+
+        result = self.run_launcher(
+            tmp_path, {"PYENV_ROOT": pyenv_root, "PYENV_VERSION": "3.99"}
+        )
+
+        assert "requests" in {d["name"] for d in result["result"]}
+
+    def test_prefers_pyenv_version_variable(self, tmp_path):
+        pyenv_root = self.fake_pyenv_root(tmp_path, "3.99.1")
+        (tmp_path / ".python-version").write_text("2.7\n")
+
+        result = self.run_launcher(
+            tmp_path, {"PYENV_ROOT": pyenv_root, "PYENV_VERSION": "3.99.1"}
+        )
+
+        assert "requests" in {d["name"] for d in result["result"]}
+
+
+class TestStreamOption:
+    def test_one_shot_streams_records_then_trailer(self):
+        input_json = json.dumps({
+            "function": "parse_requirements",
+            "args": [os.path.join(FIXTURES, "requirements")],
+            "options": {"stream": True},
+        })
+        result = subprocess.run(
+            [sys.executable, RUN_PY],
+            input=input_json,
+            capture_output=True,
+            text=True,
+            cwd=HELPERS_DIR,
+        )
+        lines = [json.loads(line) for line in result.stdout.splitlines()]
+
+        *records, trailer = lines
+        assert "requests" in {r["name"] for r in records}
+        assert trailer["summary"]["dependencies"] == len(records)
+
+    def test_serve_tags_streamed_records_with_the_request_id(self):
+        responses = serve_helper([{
+            "id": 5,
+            "function": "parse_setup",
+            "args": [os.path.join(FIXTURES, "setup_py")],
+            "options": {"stream": True},
+        }])
+
+        *records, trailer = responses
+        assert all(r["id"] == 5 for r in responses)
+        assert "requests" in {r["name"] for r in records}
+        assert trailer["errors"] == []
+
+    def test_prefork_relays_streamed_records(self):
+        responses = serve_helper([{
+            "id": 5,
+            "function": "parse_setup",
+            "args": [os.path.join(FIXTURES, "setup_py")],
+            "options": {"stream": True},
+        }], mode="--prefork")
+
+        *records, trailer = responses
+        assert "requests" in {r["name"] for r in records}
+        assert trailer["summary"]["dependencies"] == len(records)
+
+    def test_batch_rejects_streaming(self):
+        result = run_helper("batch", [{
+            "function": "parse_setup",
+            "args": [os.path.join(FIXTURES, "setup_py")],
+            "options": {"stream": True},
+        }])
+
+        assert "Streaming" in result["result"][0]["error"]
+
+
+class TestFilesOption:
+    def test_serve_reads_files_from_the_request(self, tmp_path):
+        directory = str(tmp_path / "not-written")
+        responses = serve_helper([
+            {
+                "id": 1,
+                "function": "parse_requirements",
+                "args": [directory],
+                "options": {"files": {"requirements.txt": "requests\n"}},
+            },
+            {
+                "id": 2,
+                "function": "parse_requirements",
+                "args": [directory],
+            },
+        ])
+
+        assert [d["name"] for d in responses[0]["result"]] == ["requests"]
+        assert responses[1] == {"result": [], "id": 2}
+
+
+class TestEcosystemOption:
+    def test_serve_answers_both_ecosystems(self):
+        fixture = os.path.join(FIXTURES, "pep621_uv_sources.toml")
+        responses = serve_helper([
+            {
+                "id": ecosystem,
+                "function": "parse_pep621_pep735_dependencies",
+                "args": [fixture],
+                "options": {"ecosystem": ecosystem},
+            }
+            for ecosystem in ("python", "uv")
+        ] + [{
+            "id": "requirements",
+            "function": "parse_requirements",
+            "args": [os.path.join(FIXTURES, "requirements")],
+            "options": {"ecosystem": "uv"},
+        }])
+
+        python, uv, requirements = responses
+        assert not any(d.get("path_dependency") for d in python["result"])
+        assert [d["name"] for d in uv["result"] if d.get("path_dependency")] \
+            == ["mylib"]
+        assert requirements["result"]
+
+    def test_defaults_to_the_environment_variable(self, monkeypatch):
+        monkeypatch.setenv("DEPENDABOT_HELPER_ECOSYSTEM", "uv")
+        fixture = os.path.join(FIXTURES, "pep621_uv_sources.toml")
+
+        result = run_helper("parse_pep621_pep735_dependencies", [fixture])
+
+        assert any(d.get("path_dependency") for d in result["result"])
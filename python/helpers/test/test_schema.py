@@ -0,0 +1,115 @@
+import json
+import os
+
+from lib import parser, schema
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def results(function, path, **kwargs):
+    output = getattr(parser, function)(
+        os.path.join(FIXTURES, path), **kwargs
+    )
+    return json.loads(output)["result"]
+
+
+class TestRoundTrip:
+    def assert_round_trips(self, function, path, **kwargs):
+        records = results(function, path, **kwargs)
+        compact = results(function, path, schema=2, **kwargs)
+
+        assert compact["schema"] == 2
+        assert schema.expand(compact) == records
+        # Key order too, so the Ruby side sees identical records
+        assert [list(r) for r in schema.expand(compact)] == \
+            [list(r) for r in records]
+
+    def test_requirements(self):
+        self.assert_round_trips("parse_requirements", "requirements")
+
+    def test_requirements_with_hashes_and_spans(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "requests==2.31.0 \\\n"
+            "    --hash=sha256:" + "0" * 64 + "\n"
+            "urllib3==2.2.1\n"
+        )
+
+        self.assert_round_trips(
+            "parse_requirements", str(tmp_path),
+            hashes=True, source_spans=True,
+        )
+
+    def test_setup_py(self):
+        self.assert_round_trips("parse_setup", "setup_py")
+
+    def test_setup_cfg(self):
+        self.assert_round_trips("parse_setup", "setup_cfg")
+
+    def test_pep621(self):
+        for fixture in sorted(os.listdir(FIXTURES)):
+            if fixture.endswith(".toml"):
+                self.assert_round_trips(
+                    "parse_pep621_pep735_dependencies", fixture
+                )
+
+
+class TestCompact:
+    def test_groups_and_interns(self):
+        records = [
+            {"name": "a", "markers": "m", "file": "x.txt", "extras": []},
+            {"name": "b", "markers": "m", "file": "x.txt", "extras": ["e"]},
+            {"name": "c", "markers": None, "file": "y.txt", "extras": []},
+            {"name": "d", "markers": None, "file": "x.txt", "extras": []},
+        ]
+
+        result = schema.compact(records)
+
+        assert result == {
+            "schema": 2,
+            "fields": ["name", "markers", "file", "extras"],
+            "strings": ["x.txt", "m", "e", "y.txt"],
+            "files": [
+                {"file": 0, "dependencies": [["a", 1], ["b", 1, [2]]]},
+                {"file": 3, "dependencies": [["c"]]},
+                {"file": 0, "dependencies": [["d"]]},
+            ],
+        }
+        assert schema.expand(result) == records
+
+    def test_keeps_records_with_other_keys_as_objects(self):
+        records = [
+            {"name": "a", "file": "f", "requirement_type": "dependencies"},
+            {"name": "b", "file": "f", "path": "../b", "extras": []},
+        ]
+
+        result = schema.compact(records)
+
+        assert result["files"][0]["dependencies"][1] == {
+            "name": "b", "file": 0, "path": "../b", "extras": [],
+        }
+        assert schema.expand(result) == records
+
+    def test_keeps_empty_strings(self):
+        records = [{"name": "a", "file": "f", "requirement": ""}]
+
+        assert schema.expand(schema.compact(records)) == records
+
+    def test_is_smaller(self):
+        records = [
+            {
+                "name": f"package-{i}",
+                "version": "1.0.0",
+                "markers": 'python_version >= "3.8"',
+                "file": "requirements/production.txt",
+                "requirement": "==1.0.0",
+                "extras": [],
+            }
+            for i in range(1000)
+        ]
+
+        default = len(json.dumps(records))
+        compact = len(
+            json.dumps(schema.compact(records), separators=(",", ":"))
+        )
+
+        assert compact * 3 < default
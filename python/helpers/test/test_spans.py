@@ -0,0 +1,82 @@
+import json
+import os
+import time
+
+from lib import dispatcher, spans, tokenizer
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def events(path):
+    with open(path) as f:
+        trace = json.load(f)
+    return [e for e in trace["traceEvents"] if e["ph"] == "X"]
+
+
+class TestSpans:
+    def test_records_nested_spans(self, tmp_path):
+        path = str(tmp_path / "trace.json")
+
+        with spans.recording(path):
+            with spans.span("outer", file="a.txt"):
+                with spans.span("inner"):
+                    time.sleep(0.01)
+
+        inner, outer = events(path)
+        assert (inner["name"], outer["name"]) == ("inner", "outer")
+        assert outer["args"] == {"file": "a.txt"}
+        assert inner["dur"] >= 10000
+        assert outer["ts"] <= inner["ts"]
+        assert outer["ts"] + outer["dur"] >= inner["ts"] + inner["dur"]
+
+    def test_steps_leave_out_the_consumer(self, tmp_path):
+        path = str(tmp_path / "trace.json")
+
+        with spans.recording(path):
+            for _ in spans.steps("step", range(2)):
+                time.sleep(0.05)
+
+        steps = events(path)
+        assert len(steps) == 3
+        assert all(step["dur"] < 50000 for step in steps)
+
+    def test_does_nothing_outside_a_recording(self):
+        with spans.span("ignored"):
+            pass
+
+        assert getattr(spans.recorder, "events", None) is None
+
+
+class TestTraceOption:
+    def test_traces_parse_setup(self, tmp_path):
+        path = str(tmp_path / "trace.json")
+
+        response = dispatcher.call(
+            "parse_setup",
+            [os.path.join(FIXTURES, "setup_py")],
+            {"trace": path},
+        )
+
+        assert "result" in response
+        assert {e["name"] for e in events(path)} == {
+            "parse_setup", "rewrite setup.py", "exec setup.py",
+        }
+
+    def test_traces_parse_requirements(self, tmp_path):
+        path = str(tmp_path / "trace.json")
+
+        dispatcher.call(
+            "parse_requirements",
+            [os.path.join(FIXTURES, "requirements")],
+            {"trace": path},
+        )
+
+        names = {e["name"] for e in events(path)}
+        assert {
+            "parse_requirements",
+            "discover requirement files",
+            "pip parse_requirements",
+            # Every line of the fixtures takes the fast path, if there is one
+            "tokenize requirement line" if tokenizer.MATCHES_PIP
+            else "install_req_from_parsed_requirement",
+        } == names
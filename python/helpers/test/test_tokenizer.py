@@ -0,0 +1,177 @@
+import json
+import sys
+
+import pytest
+
+import lib
+from lib import parser, tokenizer
+
+HASH = "sha256:" + "0123456789abcdef" * 4
+
+# Lines the tokenizer reads, lines it leaves to pip, and lines that aren't
+# valid, to compare what pip makes of each with what the fast path does
+CORPUS = [
+    "requests",
+    "requests==2.31.0",
+    "Requests==2.31.0",
+    "zope.interface==6.0",
+    "typing_extensions==4.7.1",
+    "ruamel.yaml.clib==0.2.7",
+    "a==1",
+    "x1==1.0",
+    "requests>=2.13.0,<3.0",
+    "requests >= 2.13.0 , < 3.0",
+    "requests == 2.31.0",
+    "requests==2.*",
+    "requests!=2.0.*",
+    "requests~=2.31",
+    "requests~=2",
+    "requests~=1.0alpha1",
+    "requests===2.31.0",
+    "requests===foo,bar",
+    "requests<=3,>1",
+    "requests>1,<=3,!=2.1",
+    "requests==2.31.0+local.1",
+    "requests==1.0.post1.dev2",
+    "requests==v1.0",
+    "requests==1!2.0",
+    "requests==1.0alpha1",
+    "requests==1.0-1",
+    "requests==1.0foo",
+    "requests==",
+    "requests==1.0 2.0",
+    "requests==1.0,",
+    "requests,==1.0",
+    "requests[security]",
+    "requests[security]==2.31.0",
+    "requests[Security,SOCKS]>=2",
+    "requests[Security,SOCKS]",
+    "requests[ security , socks ]==2.31.0",
+    "requests [security] ==2.31.0",
+    "requests[]==2.31.0",
+    "requests[ ]",
+    "requests[a__b]==1.0",
+    "requests[a__b]",
+    "requests[a,]==1.0",
+    "requests[a b]==1.0",
+    "requests[security",
+    "requests==1.0[security]",
+    "requests (>=2.0)",
+    "requests>=2.0 ; python_version >= '3.8'",
+    'requests==2.31.0; python_version<"3.8"',
+    'requests==2.31.0 ; sys_platform == "win32" and python_version > "3"',
+    "requests==2.31.0 ;",
+    "requests==2.31.0 ; python_version >",
+    "requests==2.31.0 ; extra == 'x'",
+    "requests[socks]==2.31.0 ; platform_machine != 'x86_64'",
+    f"requests==2.31.0 --hash={HASH}",
+    f"requests==2.31.0 --hash={HASH} --hash={HASH}",
+    f"requests==2.31.0   --hash={HASH}  ",
+    f"requests==2.31.0 --hash {HASH}",
+    "requests==2.31.0 --hash=md5:0123",
+    "requests==2.31.0 --hash=sha256",
+    f"requests==2.31.0 \\\n    --hash={HASH} \\\n    --hash={HASH}",
+    f"requests==2.31.0 ; python_version >= '3.8' \\\n    --hash={HASH}",
+    "requests==2.31.0 \\\n    # via flask",
+    "requests==2.31.0  # a comment",
+    "requests==2.31.0\t--hash=" + HASH,
+    "requests==2.31.0 --global-option=--no-user-cfg",
+    "requests==2.31.0 --config-settings=a=b",
+    "requests @ https://example.com/requests-2.31.0.tar.gz",
+    "https://example.com/requests-2.31.0.tar.gz#egg=requests",
+    "git+https://github.com/psf/requests.git@v2.31.0#egg=requests",
+    "-e git+https://github.com/psf/requests.git#egg=requests",
+    "-e .",
+    "./local/path",
+    "requests-2.31.0-py3-none-any.whl",
+    "requests==2.31.0.zip",
+    "requests==2.31.0.tar",
+    "requests[socks].zip",
+    "--index-url https://example.com/simple",
+    "--extra-index-url=https://example.com/simple",
+    "--pre",
+    "--only-binary :all:",
+    "--no-binary requests",
+    "requests=>2.0",
+    "requests=2.0",
+    "-requests",
+    "requests-",
+    "_requests==1.0",
+    "requests==${VERSION}",
+    "${NAME}==1.0",
+    "Ünicode==1.0",
+    "requests==1.0\x0c",
+]
+
+
+def parse(directory, fast_path):
+    return json.loads(parser.parse_requirements(
+        str(directory), keep_going=True, fast_path=fast_path
+    ))
+
+
+class TestCorpus:
+    @pytest.mark.parametrize("line", CORPUS)
+    def test_matches_pip(self, line, tmp_path, monkeypatch):
+        monkeypatch.setenv("VERSION", "2.31.0")
+        monkeypatch.setenv("NAME", "requests")
+        (tmp_path / "requirements.txt").write_text(line + "\n")
+
+        assert parse(tmp_path, True) == parse(tmp_path, False)
+
+    def test_matches_pip_for_the_whole_corpus(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "\n".join(
+                line for line in CORPUS
+                if not line.startswith(("-e", "--index-url"))
+            ) + "\n"
+        )
+
+        fast = parse(tmp_path, True)
+
+        assert fast == parse(tmp_path, False)
+        assert fast["result"]
+
+    def test_isnt_imported_without_the_fast_path(self, tmp_path, monkeypatch):
+        monkeypatch.delattr(lib, "tokenizer")
+        monkeypatch.setitem(sys.modules, "lib.tokenizer", None)
+        (tmp_path / "requirements.txt").write_text("requests==2.31.0\n")
+
+        result = parse(tmp_path, False)
+
+        assert [d["name"] for d in result["result"]] == ["requests"]
+
+
+@pytest.mark.skipif(
+    not tokenizer.MATCHES_PIP, reason="pip vendors another packaging"
+)
+class TestRecord:
+    @pytest.mark.parametrize("line", [
+        "requests",
+        "requests[socks]>=2.13.0,<3.0",
+        f"requests==2.31.0 ; python_version >= '3.8'  --hash={HASH}",
+    ])
+    def test_reads_simple_lines(self, line):
+        assert tokenizer.record(line) is not None
+
+    @pytest.mark.parametrize("line", [
+        "requests @ https://example.com/requests-2.31.0.tar.gz",
+        "-e .",
+        "./local/path",
+        "requests==2.31.0 --config-settings=a=b",
+        "requests (>=2.0)",
+        "requests=>2.0",
+    ])
+    def test_leaves_other_lines_to_pip(self, line):
+        assert tokenizer.record(line) is None
+
+    def test_formats_the_record_like_pip(self):
+        assert tokenizer.record(
+            "Requests[Socks,security]== 2.31.0 ;python_version>'3'"
+        ) == {
+            "name": "Requests",
+            "version": "2.31.0",
+            "markers": 'python_version > "3"',
+            "requirement": "==2.31.0",
+            "extras": ["Socks", "security"],
+        }